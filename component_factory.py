@@ -1,24 +1,38 @@
 import os
 from functools import lru_cache
+from typing import Optional
 
 from fastapi import Depends
-from httpx import AsyncClient
+from httpx import AsyncClient, Limits
 from sqlalchemy import NullPool
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, async_sessionmaker, AsyncSession
 
 from model.configuration import Config, CostEstimationConfig
+from model.position import GeocodingResult
+from model.responses.directions_api import DirectionsApiResponse
+from model.responses.user import UserHandlerGetByEmailResponse
+from service.auth_service import AuthService
+from service.candidate_search import CandidateSearch
 from service.cost_estimation_service import CostEstimationService
 from service.db_migration_service import DatabaseMigrationService
+from service.db_pool_metrics import InstrumentedAsyncAdaptedQueuePool
+from service.directions_cache_store import DirectionsCacheStore
 from service.directions_service import DirectionsService
 from service.driver_service import DriverService
+from service.geocoding_cache_store import GeocodingCacheStore
 from service.geocoding_service import GeocodingService
 from service.image_normalization_service import ImageNormalizationService
 from service.image_service import ImageService
 from service.knapsack_service import KnapsackService
+from service.open_orders_index import OpenOrdersIndex
 from service.rating_service import RatingService
+from service.single_flight import SingleFlight
 from service.passenger_service import PassengerService
+from service.profit_estimation_service import ProfitEstimationService
 from service.subscription_handler_service import SubscriptionHandlerService
+from service.suggestion_job_service import SuggestionJobService
 from service.time_service import TimeService
+from service.ttl_cache import TtlCache
 from service.user_handler_service import UserHandlerService
 
 
@@ -35,6 +49,53 @@ def get_config() -> Config:
         subscriptions_handler_base_url=os.getenv("SUBSCRIPTIONS_HANDLER_BASE_URL"),
         geocoding_api_key=os.getenv("GEOCODING_API_KEY"),
         directions_api_url=os.getenv("DIRECTIONS_API_URL"),
+        db_pool_enabled=os.getenv("DB_POOL_ENABLED", "true").lower() == "true",
+        db_pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        db_pool_max_overflow=int(os.getenv("DB_POOL_MAX_OVERFLOW", "10")),
+        db_pool_timeout_seconds=float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30")),
+        db_pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+        db_pool_recycle_seconds=int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800")),
+        db_statement_cache_size=int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100")),
+        cache_db_pool_size=int(os.getenv("CACHE_DB_POOL_SIZE", "2")),
+        cache_db_pool_timeout_seconds=float(os.getenv("CACHE_DB_POOL_TIMEOUT_SECONDS", "0.5")),
+        http_max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+        http_max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        http_keepalive_expiry_seconds=float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30")),
+        http2_enabled=os.getenv("HTTP2_ENABLED", "false").lower() == "true",
+        users_handler_timeout_seconds=float(os.getenv("USERS_HANDLER_TIMEOUT_SECONDS", "5")),
+        subscriptions_handler_timeout_seconds=float(os.getenv("SUBSCRIPTIONS_HANDLER_TIMEOUT_SECONDS", "5")),
+        knapsack_timeout_seconds=float(os.getenv("KNAPSACK_TIMEOUT_SECONDS", "70")),
+        geocoding_timeout_seconds=float(os.getenv("GEOCODING_TIMEOUT_SECONDS", "5")),
+        directions_timeout_seconds=float(os.getenv("DIRECTIONS_TIMEOUT_SECONDS", "5")),
+        directions_matrix_api_url=os.getenv("DIRECTIONS_MATRIX_API_URL"),
+        directions_cache_enabled=os.getenv("DIRECTIONS_CACHE_ENABLED", "true").lower() == "true",
+        directions_cache_size=int(os.getenv("DIRECTIONS_CACHE_SIZE", "10000")),
+        directions_cache_ttl_seconds=float(os.getenv("DIRECTIONS_CACHE_TTL_SECONDS", "900")),
+        directions_cache_precision=int(os.getenv("DIRECTIONS_CACHE_PRECISION", "4")),
+        directions_persistent_cache_enabled=os.getenv("DIRECTIONS_PERSISTENT_CACHE_ENABLED", "true").lower() == "true",
+        directions_persistent_cache_ttl_seconds=float(os.getenv("DIRECTIONS_PERSISTENT_CACHE_TTL_SECONDS", "604800")),
+        directions_cache_time_bucket_hours=int(os.getenv("DIRECTIONS_CACHE_TIME_BUCKET_HOURS", "1")),
+        token_cache_enabled=os.getenv("TOKEN_CACHE_ENABLED", "true").lower() == "true",
+        token_cache_size=int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+        token_cache_ttl_seconds=float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60")),
+        token_signing_key_location=os.getenv("TOKEN_SIGNING_KEY_LOCATION"),
+        knapsack_local_max_items=int(os.getenv("KNAPSACK_LOCAL_MAX_ITEMS", "12")),
+        knapsack_local_solutions_amount=int(os.getenv("KNAPSACK_LOCAL_SOLUTIONS_AMOUNT", "3")),
+        knapsack_local_solution_ttl_seconds=float(os.getenv("KNAPSACK_LOCAL_SOLUTION_TTL_SECONDS", "60")),
+        user_profile_cache_enabled=os.getenv("USER_PROFILE_CACHE_ENABLED", "true").lower() == "true",
+        user_profile_cache_size=int(os.getenv("USER_PROFILE_CACHE_SIZE", "10000")),
+        user_profile_cache_ttl_seconds=float(os.getenv("USER_PROFILE_CACHE_TTL_SECONDS", "300")),
+        geocoding_cache_enabled=os.getenv("GEOCODING_CACHE_ENABLED", "true").lower() == "true",
+        geocoding_cache_size=int(os.getenv("GEOCODING_CACHE_SIZE", "10000")),
+        geocoding_cache_ttl_seconds=float(os.getenv("GEOCODING_CACHE_TTL_SECONDS", "86400")),
+        geocoding_persistent_cache_enabled=os.getenv("GEOCODING_PERSISTENT_CACHE_ENABLED", "false").lower() == "true",
+        geocoding_persistent_cache_ttl_seconds=float(os.getenv("GEOCODING_PERSISTENT_CACHE_TTL_SECONDS", "2592000")),
+        open_orders_index_enabled=os.getenv("OPEN_ORDERS_INDEX_ENABLED", "true").lower() == "true",
+        open_orders_index_refresh_seconds=float(os.getenv("OPEN_ORDERS_INDEX_REFRESH_SECONDS", "30")),
+        candidate_search_rings_km=tuple(float(r) for r in os.getenv("CANDIDATE_SEARCH_RINGS_KM", "1,3,10").split(",")),
+        candidate_pool_size=int(os.getenv("CANDIDATE_POOL_SIZE", "10")),
+        candidate_search_budget_seconds=float(os.getenv("CANDIDATE_SEARCH_BUDGET_SECONDS", "1")),
+        suggestion_jobs_ttl_seconds=float(os.getenv("SUGGESTION_JOBS_TTL_SECONDS", "300")),
     )
 
 
@@ -48,15 +109,48 @@ def get_database_url(config: Config = Depends(get_config)) -> str:
 
 @lru_cache()
 def create_db_engine(db_url: str = Depends(get_database_url)) -> AsyncEngine:
+    config = get_config()
+    connect_args = {"prepared_statement_cache_size": config.db_statement_cache_size}
+    if not config.db_pool_enabled:
+        return create_async_engine(db_url, future=True, poolclass=NullPool, connect_args=connect_args)
+
     return create_async_engine(
         db_url,
         future=True,
-        poolclass=NullPool,
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        pool_size=config.db_pool_size,
+        max_overflow=config.db_pool_max_overflow,
+        pool_timeout=config.db_pool_timeout_seconds,
+        pool_pre_ping=config.db_pool_pre_ping,
+        pool_recycle=config.db_pool_recycle_seconds,
+        connect_args=connect_args,
     )
 
     # return eng.execution_options(isolation_level="AUTOCOMMIT")
 
 
+@lru_cache()
+def create_cache_db_engine(db_url: str) -> AsyncEngine:
+    # The persistent caches are used while the request already holds a connection of the main pool, so under load
+    # they would wait the whole pool timeout for a second one. They get their own small pool with a short checkout
+    # timeout instead, and a busy pool makes a lookup miss rather than stall the request.
+    config = get_config()
+    connect_args = {"prepared_statement_cache_size": config.db_statement_cache_size}
+    if not config.db_pool_enabled:
+        return create_async_engine(db_url, future=True, poolclass=NullPool, connect_args=connect_args)
+
+    return create_async_engine(
+        db_url,
+        future=True,
+        pool_size=config.cache_db_pool_size,
+        max_overflow=0,
+        pool_timeout=config.cache_db_pool_timeout_seconds,
+        pool_pre_ping=config.db_pool_pre_ping,
+        pool_recycle=config.db_pool_recycle_seconds,
+        connect_args=connect_args,
+    )
+
+
 @lru_cache()
 def get_db_session_maker(engine: AsyncEngine = Depends(create_db_engine)) -> async_sessionmaker[AsyncSession]:
     return async_sessionmaker(engine, expire_on_commit=False)
@@ -87,40 +181,236 @@ def get_rating_service(db_session: AsyncSession = Depends(get_db_session)):
     return RatingService(db_session)
 
 
+@lru_cache()
+def get_open_orders_index() -> Optional[OpenOrdersIndex]:
+    config = get_config()
+    if not config.open_orders_index_enabled:
+        return None
+    return OpenOrdersIndex(config.open_orders_index_refresh_seconds)
+
+
+@lru_cache()
+def get_candidate_search() -> CandidateSearch:
+    config = get_config()
+    return CandidateSearch(
+        config.candidate_search_rings_km, config.candidate_pool_size, config.candidate_search_budget_seconds
+    )
+
+
 def get_passenger_service(db_session: AsyncSession = Depends(get_db_session)):
-    return PassengerService(db_session)
+    return PassengerService(db_session, get_open_orders_index(), get_candidate_search())
 
 
 def get_driver_service(db_session: AsyncSession = Depends(get_db_session), passenger_service: PassengerService = Depends(get_passenger_service)):
     return DriverService(db_session, passenger_service)
 
 
-def get_user_handler_service(config: Config = Depends(get_config)):
-    client = AsyncClient(base_url=config.users_handler_base_url)
-    return UserHandlerService(client)
+@lru_cache()
+def get_suggestion_job_service() -> SuggestionJobService:
+    return SuggestionJobService(get_config().suggestion_jobs_ttl_seconds)
+
+
+def _create_http_client(base_url: Optional[str], timeout_seconds: float) -> AsyncClient:
+    config = get_config()
+    limits = Limits(
+        max_connections=config.http_max_connections,
+        max_keepalive_connections=config.http_max_keepalive_connections,
+        keepalive_expiry=config.http_keepalive_expiry_seconds,
+    )
+    return AsyncClient(base_url=base_url or "", timeout=timeout_seconds, limits=limits, http2=config.http2_enabled)
+
+
+@lru_cache()
+def get_users_handler_http_client() -> AsyncClient:
+    config = get_config()
+    return _create_http_client(config.users_handler_base_url, config.users_handler_timeout_seconds)
+
+
+@lru_cache()
+def get_subscriptions_handler_http_client() -> AsyncClient:
+    config = get_config()
+    return _create_http_client(config.subscriptions_handler_base_url, config.subscriptions_handler_timeout_seconds)
+
+
+@lru_cache()
+def get_knapsack_http_client() -> AsyncClient:
+    config = get_config()
+    return _create_http_client(config.knapsack_service_url, config.knapsack_timeout_seconds)
+
+
+@lru_cache()
+def get_geocoding_http_client() -> AsyncClient:
+    return _create_http_client("https://geocode.search.hereapi.com/v1", get_config().geocoding_timeout_seconds)
+
+
+@lru_cache()
+def get_directions_http_client() -> AsyncClient:
+    config = get_config()
+    return _create_http_client(config.knapsack_service_url, config.directions_timeout_seconds)
+
+
+# Clients are shared by all requests, so their connections are kept alive between requests
+HTTP_CLIENT_FACTORIES = [
+    get_users_handler_http_client,
+    get_subscriptions_handler_http_client,
+    get_knapsack_http_client,
+    get_geocoding_http_client,
+    get_directions_http_client,
+]
+
+
+def open_http_clients():
+    for factory in HTTP_CLIENT_FACTORIES:
+        factory()
+
+
+async def close_http_clients():
+    for factory in HTTP_CLIENT_FACTORIES:
+        if factory.cache_info().currsize:
+            await factory().aclose()
+            factory.cache_clear()
+
+
+# Single flight groups are per process, so concurrent requests share in flight calls
+@lru_cache()
+def get_users_single_flight() -> SingleFlight:
+    return SingleFlight()
+
+
+@lru_cache()
+def get_geocoding_single_flight() -> SingleFlight:
+    return SingleFlight()
 
 
-def get_subscription_handler_service(config: Config = Depends(get_config)):
-    client = AsyncClient(base_url=config.subscriptions_handler_base_url)
-    return SubscriptionHandlerService(client)
+@lru_cache()
+def get_directions_single_flight() -> SingleFlight:
+    return SingleFlight()
+
+
+@lru_cache()
+def get_user_profile_cache() -> Optional[TtlCache[UserHandlerGetByEmailResponse]]:
+    config = get_config()
+    if not config.user_profile_cache_enabled:
+        return None
+    return TtlCache(config.user_profile_cache_size, config.user_profile_cache_ttl_seconds)
+
+
+def get_user_handler_service():
+    return UserHandlerService(
+        get_users_handler_http_client(), single_flight=get_users_single_flight(), profile_cache=get_user_profile_cache()
+    )
+
+
+@lru_cache()
+def get_token_cache() -> Optional[TtlCache[dict]]:
+    config = get_config()
+    if not config.token_cache_enabled:
+        return None
+    return TtlCache(config.token_cache_size, config.token_cache_ttl_seconds)
+
+
+@lru_cache()
+def get_token_signing_key() -> Optional[str]:
+    location = get_config().token_signing_key_location
+    if not location:
+        return None
+    with open(location) as f:
+        return f.read()
+
+
+def get_subscription_handler_service():
+    return SubscriptionHandlerService(get_subscriptions_handler_http_client())
 
 
 def get_time_service() -> TimeService:
     return TimeService()
 
 
+def get_auth_service(
+    user_handler_service: UserHandlerService = Depends(get_user_handler_service),
+    time_service: TimeService = Depends(get_time_service),
+) -> AuthService:
+    return AuthService(
+        user_handler_service,
+        time_service,
+        cache=get_token_cache(),
+        max_cache_seconds=get_config().token_cache_ttl_seconds,
+        signing_key=get_token_signing_key(),
+    )
+
+
 def get_knapsack_service(config: Config = Depends(get_config), time_service: TimeService = Depends(get_time_service)):
-    client = AsyncClient(base_url=config.knapsack_service_url, timeout=70)
-    return KnapsackService(client, time_service)
+    return KnapsackService(
+        get_knapsack_http_client(),
+        time_service,
+        local_max_items=config.knapsack_local_max_items,
+        local_solutions_amount=config.knapsack_local_solutions_amount,
+        local_solution_ttl_seconds=config.knapsack_local_solution_ttl_seconds,
+    )
+
+
+@lru_cache()
+def get_geocoding_cache() -> Optional[TtlCache[GeocodingResult]]:
+    config = get_config()
+    if not config.geocoding_cache_enabled:
+        return None
+    return TtlCache(config.geocoding_cache_size, config.geocoding_cache_ttl_seconds)
+
+
+@lru_cache()
+def get_geocoding_cache_store() -> Optional[GeocodingCacheStore]:
+    config = get_config()
+    if not config.geocoding_persistent_cache_enabled:
+        return None
+    return GeocodingCacheStore(
+        get_db_session_maker(create_cache_db_engine(get_database_url(config))),
+        get_time_service(),
+        ttl_seconds=config.geocoding_persistent_cache_ttl_seconds,
+    )
 
 
 def get_geocoding_service(config: Config = Depends(get_config)):
-    client = AsyncClient(base_url="https://geocode.search.hereapi.com/v1")
-    return GeocodingService(client, config.geocoding_api_key)
+    return GeocodingService(
+        get_geocoding_http_client(),
+        config.geocoding_api_key,
+        single_flight=get_geocoding_single_flight(),
+        cache=get_geocoding_cache(),
+        store=get_geocoding_cache_store(),
+    )
+
+
+@lru_cache()
+def get_directions_cache() -> Optional[TtlCache[DirectionsApiResponse]]:
+    config = get_config()
+    if not config.directions_cache_enabled:
+        return None
+    return TtlCache(config.directions_cache_size, config.directions_cache_ttl_seconds)
+
+
+@lru_cache()
+def get_directions_cache_store() -> Optional[DirectionsCacheStore]:
+    config = get_config()
+    if not config.directions_persistent_cache_enabled:
+        return None
+    return DirectionsCacheStore(
+        get_db_session_maker(create_cache_db_engine(get_database_url(config))),
+        get_time_service(),
+        precision=config.directions_cache_precision,
+        time_bucket_hours=config.directions_cache_time_bucket_hours,
+        ttl_seconds=config.directions_persistent_cache_ttl_seconds,
+    )
 
 
 def get_directions_service(config: Config = Depends(get_config)) -> DirectionsService:
-    return DirectionsService(config.directions_api_url, http_client=AsyncClient(base_url=config.knapsack_service_url))
+    return DirectionsService(
+        config.directions_api_url,
+        http_client=get_directions_http_client(),
+        cache=get_directions_cache(),
+        cache_precision=config.directions_cache_precision,
+        store=get_directions_cache_store(),
+        matrix_api_url=config.directions_matrix_api_url,
+        single_flight=get_directions_single_flight(),
+    )
 
 
 def get_cost_estimation_config() -> CostEstimationConfig:
@@ -131,3 +421,11 @@ def get_cost_estimation_service(
     config: CostEstimationConfig = Depends(get_cost_estimation_config),
 ) -> CostEstimationService:
     return CostEstimationService(config)
+
+
+def get_profit_estimation_service(
+    directions_service: DirectionsService = Depends(get_directions_service),
+    cost_estimation_service: CostEstimationService = Depends(get_cost_estimation_service),
+    time_service: TimeService = Depends(get_time_service),
+) -> ProfitEstimationService:
+    return ProfitEstimationService(directions_service, cost_estimation_service, time_service)
@@ -1,35 +1,39 @@
-import math
+import asyncio
 from datetime import datetime, timedelta
 from http import HTTPStatus
-from typing import Any
+from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from component_factory import get_passenger_service, get_knapsack_service, get_driver_service, get_time_service, \
-    get_directions_service, get_cost_estimation_service, get_user_handler_service
+    get_directions_service, get_user_handler_service, get_profit_estimation_service, get_suggestion_job_service, \
+    get_config, get_database_url, create_db_engine, get_db_session_maker, get_open_orders_index, get_candidate_search
 from controllers.utils import AuthenticatedUser, authenticated_user, adjust_timezone
-from mappings.factory_mapping import LIMITS_MAPPING
 from model.driver_drive_order import DriverDriveOrder, DriveOrderStatus
-from model.passenger_drive_order import PassengerDriveOrderStatus, PassengerDriveOrder
-from model.requests.driver import DriverRequestDrive, DriverAcceptDrive, Limit, LimitValues
+from model.passenger_drive_order import PassengerDriveOrder
+from model.requests.driver import DriverRequestDrive, DriverAcceptDrive
 from model.requests.knapsack import KnapsackItem
-from model.responses.driver import DriveDetails, OrderLocation
+from model.responses.driver import DriveDetails, OrderLocation, SuggestionJobResponse
 from model.responses.geocode import Geocode
 from model.responses.knapsack import SuggestedSolution, KnapsackSolution
 from model.responses.success import SuccessResponse
 from model.responses.user import UserHandlerGetByEmailResponse
 from model.top_candidate import TopCandidate
-from service.cost_estimation_service import CostEstimationService
 from service.directions_service import DirectionsService
 from service.driver_service import DriverService
 from service.knapsack_service import KnapsackService
 from service.passenger_service import PassengerService
+from service.profit_estimation_service import ProfitEstimationService
+from service.route_planner import plan_route
+from service.suggestion_job_service import SuggestionJobService, SuggestionJob
 from service.time_service import TimeService
 from service.user_handler_service import UserHandlerService
 
 router = APIRouter()
 
-CANDIDATES_AMOUNT = 2
+SUGGESTION_JOB_KEEPALIVE_SECONDS = 15
 
 
 def _orders_to_suggestions(current_drive_orders: list[DriverDriveOrder], time_service: TimeService):
@@ -43,12 +47,13 @@ def _orders_to_suggestions(current_drive_orders: list[DriverDriveOrder], time_se
 
 
 async def _estimate_incomes(passenger_service: PassengerService, suggestion: SuggestedSolution) -> SuggestedSolution:
+    order_ids = {int(item.id) for s in suggestion.solutions.values() for item in s.items}
+    if not order_ids:
+        return suggestion
+
+    orders_costs = {order.id: order.estimated_cost for order in await passenger_service.get_by_ids(list(order_ids))}
     for suggestion_id, knapsack_suggestion in suggestion.solutions.items():
-        total_income = 0
-        for item in knapsack_suggestion.items:
-            order = await passenger_service.get_by_order_id(int(item.id))
-            total_income += order.estimated_cost
-        knapsack_suggestion.total_value = total_income
+        knapsack_suggestion.total_value = sum(orders_costs.get(int(item.id), 0) for item in knapsack_suggestion.items)
     return suggestion
 
 
@@ -61,38 +66,205 @@ async def order_new_drive(
     passenger_service: PassengerService = Depends(get_passenger_service),
     driver_service: DriverService = Depends(get_driver_service),
     time_service: TimeService = Depends(get_time_service),
-    directions_service: DirectionsService = Depends(get_directions_service),
-    cost_estimation_service: CostEstimationService = Depends(get_cost_estimation_service),
+    profit_estimation_service: ProfitEstimationService = Depends(get_profit_estimation_service),
+) -> SuggestedSolution:
+    return await _suggest_drives(
+        order_request,
+        force_reject,
+        knapsack_service,
+        user,
+        passenger_service,
+        driver_service,
+        time_service,
+        profit_estimation_service,
+    )
+
+
+@router.post("/request-drives-async")
+async def order_new_drive_async(
+    order_request: DriverRequestDrive,
+    force_reject: bool = False,
+    knapsack_service: KnapsackService = Depends(get_knapsack_service),
+    user: AuthenticatedUser = Depends(authenticated_user),
+    time_service: TimeService = Depends(get_time_service),
+    profit_estimation_service: ProfitEstimationService = Depends(get_profit_estimation_service),
+    suggestion_job_service: SuggestionJobService = Depends(get_suggestion_job_service),
+) -> SuggestionJobResponse:
+    """
+    Same as /request-drives, but returns right away with a job id. The suggestions are fetched from
+    /suggestion-jobs/{job_id}, or streamed as server sent events from /suggestion-jobs/{job_id}/events.
+    """
+
+    async def compute() -> SuggestedSolution:
+        # The request's session is closed by the time the job runs, so it uses its own short transactions: one to
+        # claim the candidates and one to save the suggestions. No connection is held while the solver runs.
+        session_maker = get_db_session_maker(create_db_engine(get_database_url(get_config())))
+        async with session_maker() as session:
+            async with session.begin():
+                passenger_service, driver_service = _session_services(session)
+                suggestions = await _get_valid_suggestions(
+                    force_reject, user, passenger_service, driver_service, time_service
+                )
+                if suggestions is not None:
+                    return suggestions
+                orders = await _claim_candidates(
+                    order_request, knapsack_service, user, passenger_service, driver_service
+                )
+
+        try:
+            suggestions = await _solve(order_request, orders, knapsack_service, user, profit_estimation_service)
+        except BaseException:
+            async with session_maker() as session:
+                async with session.begin():
+                    passenger_service, _ = _session_services(session)
+                    await passenger_service.release_unchosen_orders_from_freeze(user.email)
+            raise
+
+        async with session_maker() as session:
+            async with session.begin():
+                passenger_service, driver_service = _session_services(session)
+                # A newer request for drives may have released the claimed orders while this job solved
+                suggested_order_ids = {int(item.id) for s in suggestions.solutions.values() for item in s.items}
+                if not await _are_orders_frozen(list(suggested_order_ids), passenger_service, user):
+                    raise HTTPException(
+                        status_code=HTTPStatus.CONFLICT, detail="The suggested orders were released while solving"
+                    )
+                return await _save_suggestions(
+                    order_request, suggestions, user, passenger_service, driver_service, time_service
+                )
+
+    request_key = _suggestion_request_key(order_request, force_reject)
+    return _to_job_response(suggestion_job_service.submit(user.email, request_key, compute))
+
+
+def _suggestion_request_key(order_request: DriverRequestDrive, force_reject: bool) -> tuple:
+    # Built from plain values, the Limit keys of the request are not JSON serializable
+    limits = tuple(sorted((limit.value, values.min, values.max) for limit, values in order_request.limits.items()))
+    return order_request.current_lat, order_request.current_lon, limits, force_reject
+
+
+@router.get("/suggestion-jobs/{job_id}")
+async def get_suggestion_job(
+    job_id: str,
+    user: AuthenticatedUser = Depends(authenticated_user),
+    suggestion_job_service: SuggestionJobService = Depends(get_suggestion_job_service),
+) -> SuggestionJobResponse:
+    return _to_job_response(_get_job(job_id, user, suggestion_job_service))
+
+
+@router.get("/suggestion-jobs/{job_id}/events")
+async def stream_suggestion_job(
+    job_id: str,
+    user: AuthenticatedUser = Depends(authenticated_user),
+    suggestion_job_service: SuggestionJobService = Depends(get_suggestion_job_service),
+) -> StreamingResponse:
+    job = _get_job(job_id, user, suggestion_job_service)
+
+    async def events():
+        while not await job.wait(SUGGESTION_JOB_KEEPALIVE_SECONDS):
+            # Comment lines keep proxies from closing the idle connection
+            yield ": keepalive\n\n"
+        yield f"event: {job.status.value.lower()}\ndata: {_to_job_response(job).json(by_alias=True)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def _get_job(job_id: str, user: AuthenticatedUser, suggestion_job_service: SuggestionJobService) -> SuggestionJob:
+    job = suggestion_job_service.get(user.email, job_id)
+    if job is None:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Suggestion job not found")
+    return job
+
+
+def _to_job_response(job: SuggestionJob) -> SuggestionJobResponse:
+    return SuggestionJobResponse(job_id=job.id, status=job.status, result=job.result, error=job.error)
+
+
+def _session_services(session: AsyncSession) -> tuple[PassengerService, DriverService]:
+    passenger_service = PassengerService(session, get_open_orders_index(), get_candidate_search())
+    return passenger_service, DriverService(session, passenger_service)
+
+
+async def _suggest_drives(
+    order_request: DriverRequestDrive,
+    force_reject: bool,
+    knapsack_service: KnapsackService,
+    user: AuthenticatedUser,
+    passenger_service: PassengerService,
+    driver_service: DriverService,
+    time_service: TimeService,
+    profit_estimation_service: ProfitEstimationService,
 ) -> SuggestedSolution:
+    suggestions = await _get_valid_suggestions(force_reject, user, passenger_service, driver_service, time_service)
+    if suggestions is not None:
+        return suggestions
+
+    orders = await _claim_candidates(order_request, knapsack_service, user, passenger_service, driver_service)
+    suggestions = await _solve(order_request, orders, knapsack_service, user, profit_estimation_service)
+    return await _save_suggestions(order_request, suggestions, user, passenger_service, driver_service, time_service)
+
+
+async def _get_valid_suggestions(
+    force_reject: bool,
+    user: AuthenticatedUser,
+    passenger_service: PassengerService,
+    driver_service: DriverService,
+    time_service: TimeService,
+) -> Optional[SuggestedSolution]:
+    if force_reject:
+        return None
+    current_drive_orders: list[DriverDriveOrder] = await driver_service.get_suggestions(user.email)
+    all_drive_orders_valid = all(d.expires_at > time_service.utcnow() for d in current_drive_orders)
+    if not current_drive_orders or not all_drive_orders_valid:
+        return None
+    suggestions = _orders_to_suggestions(current_drive_orders, time_service)
+    suggestions = get_suggestions_with_total_value_volume(suggestions)
+    return await _estimate_incomes(passenger_service, suggestions)
 
-    if not force_reject:
-        current_drive_orders: list[DriverDriveOrder] = await driver_service.get_suggestions(user.email)
-        all_drive_orders_valid = all(d.expires_at > time_service.utcnow() for d in current_drive_orders)
-        if current_drive_orders and all_drive_orders_valid:
-            suggestions = _orders_to_suggestions(current_drive_orders, time_service)
-            suggestions = get_suggestions_with_total_value_volume(suggestions)
-            return await _estimate_incomes(passenger_service, suggestions)
 
+async def _claim_candidates(
+    order_request: DriverRequestDrive,
+    knapsack_service: KnapsackService,
+    user: AuthenticatedUser,
+    passenger_service: PassengerService,
+    driver_service: DriverService,
+) -> list[TopCandidate]:
     await reject_drives(knapsack_service, user, driver_service)
-    rides = await get_top_candidates(
+    return await passenger_service.get_top_order_candidates(
         current_location=[order_request.current_lat, order_request.current_lon],
-        passenger_service=passenger_service,
-        limits=order_request.limits,
         driver_id=user.email,
-        directions_service=directions_service,
-        cost_estimation_service=cost_estimation_service,
-        time_service=time_service,
+        limits=order_request.limits,
+    )
+
+
+async def _solve(
+    order_request: DriverRequestDrive,
+    orders: list[TopCandidate],
+    knapsack_service: KnapsackService,
+    user: AuthenticatedUser,
+    profit_estimation_service: ProfitEstimationService,
+) -> SuggestedSolution:
+    rides = await get_knapsack_items(
+        current_location=[order_request.current_lat, order_request.current_lon],
+        orders=orders,
+        profit_estimation_service=profit_estimation_service,
     )
-    for ride in rides:
-        await passenger_service.set_frozen_by(int(ride.id), user.email)
     suggestions = await knapsack_service.suggest_solution(user.email, 4, rides)
-    suggestions = get_suggestions_with_total_value_volume(suggestions)
+    return get_suggestions_with_total_value_volume(suggestions)
+
+
+async def _save_suggestions(
+    order_request: DriverRequestDrive,
+    suggestions: SuggestedSolution,
+    user: AuthenticatedUser,
+    passenger_service: PassengerService,
+    driver_service: DriverService,
+    time_service: TimeService,
+) -> SuggestedSolution:
     await driver_service.save_suggestions(user.email, suggestions, [order_request.current_lat, order_request.current_lon])
     suggestions.time = adjust_timezone(suggestions.time, time_service)
     suggestions.expires_at = adjust_timezone(suggestions.expires_at, time_service)
-    suggestions = await _estimate_incomes(passenger_service, suggestions)
-
-    return suggestions
+    return await _estimate_incomes(passenger_service, suggestions)
 
 
 @router.post("/accept-drive")
@@ -109,6 +281,12 @@ async def accept_drive(
 
     now = time_service.utcnow()
     driver_order = await _get_verified_order(accept_drive_request, driver_service, now, user)
+    order_ids = [int(order["id"]) for order in driver_order.passenger_orders]
+
+    # The suggestion's orders may have been released since it was saved, e.g. by a newer request for drives
+    if not await _are_orders_frozen(order_ids, passenger_service, user):
+        await reject_drives(knapsack_service, user, driver_service)
+        return SuccessResponse(success=False)
 
     accept_success = await knapsack_service.accept_solution(
         user_id=user.email, solution_id=accept_drive_request.order_id
@@ -116,7 +294,7 @@ async def accept_drive(
     if not accept_success:
         return SuccessResponse(success=False)
 
-    await _update_frozen_orders(accept_drive_request, driver_order, passenger_service, user)
+    await _update_frozen_orders(accept_drive_request, order_ids, passenger_service, user)
     await driver_service.set_drive_status(driver_order.id, DriveOrderStatus.ACTIVE)
 
     await _update_estimated_arrivals(accept_drive_request, directions_service, now, passenger_service, driver_service, users_service, user)
@@ -124,10 +302,21 @@ async def accept_drive(
     return SuccessResponse(success=True)
 
 
-async def _update_frozen_orders(accept_drive_request: DriverAcceptDrive, driver_order: DriverDriveOrder, passenger_service: PassengerService, user: AuthenticatedUser):
-    order_ids = [int(order["id"]) for order in driver_order.passenger_orders]
-    for order_id in order_ids:
-        await passenger_service.activate_drive(order_id=order_id, drive_id=accept_drive_request.order_id)
+async def _are_orders_frozen(order_ids: list[int], passenger_service: PassengerService, user: AuthenticatedUser) -> bool:
+    """
+    Whether all the orders are still frozen for the driver. They stay locked until the request's transaction ends.
+    """
+    frozen_order_ids = await passenger_service.lock_frozen_orders(driver_id=user.email, order_ids=order_ids)
+    return set(frozen_order_ids) == set(order_ids)
+
+
+async def _update_frozen_orders(accept_drive_request: DriverAcceptDrive, order_ids: list[int], passenger_service: PassengerService, user: AuthenticatedUser):
+    activated_order_ids = await passenger_service.activate_drive_orders(
+        driver_id=user.email, order_ids=order_ids, drive_id=accept_drive_request.order_id
+    )
+    if set(activated_order_ids) != set(order_ids):
+        # Rolls back the request's transaction, so no order is left activated for a drive which is not
+        raise HTTPException(status_code=HTTPStatus.CONFLICT, detail={"message": "Drive orders are no longer available"})
     await passenger_service.release_unchosen_orders_from_freeze(user.email, order_ids)
 
 
@@ -141,16 +330,20 @@ async def _get_verified_order(accept_drive_request: DriverAcceptDrive, driver_se
 
 
 async def _update_estimated_arrivals(accept_drive_request: DriverAcceptDrive, directions_service: DirectionsService, now: datetime, passenger_service: PassengerService, driver_service: DriverService, users_service: UserHandlerService, user: AuthenticatedUser):
-    route = await order_details(accept_drive_request.order_id, passenger_service, driver_service, users_service, user)
-    passenger_locations = [r for r in route.order_locations if r.is_start_address]
+    route = await order_details(
+        accept_drive_request.order_id, passenger_service, driver_service, users_service, user, directions_service
+    )
+    # Driver is the first point, no need to estimate arrival time. The matrix was already fetched for the route.
+    locations = [loc.address for loc in route.order_locations]
+    matrix = await directions_service.get_matrix(locations, locations)
+
     total_time = 0
-    for i, loc in enumerate(passenger_locations):
-        if i == 0:  # Driver is the first point, no need to estimate arrival time
-            continue
-        total_time += (await directions_service.get_directions(passenger_locations[i - 1].address,
-                                                               passenger_locations[i].address)).duration_seconds
-        await passenger_service.update_estimated_arrival(loc.user_email, accept_drive_request.order_id,
-                                                         now + timedelta(seconds=total_time))
+    arrivals = {}
+    for i in range(1, len(route.order_locations)):
+        total_time += matrix.durations_seconds[i - 1][i]
+        if route.order_locations[i].is_start_address:
+            arrivals[route.order_locations[i].user_email] = now + timedelta(seconds=total_time)
+    await passenger_service.update_estimated_arrivals(accept_drive_request.order_id, arrivals)
 
 
 @router.post("/reject-drives")
@@ -171,12 +364,13 @@ async def order_details_preview(
     driver_service: DriverService = Depends(get_driver_service),
     users_service: UserHandlerService = Depends(get_user_handler_service),
     user: AuthenticatedUser = Depends(authenticated_user),
+    directions_service: DirectionsService = Depends(get_directions_service),
 ) -> DriveDetails:
     driver_drive = await driver_service.get_driver_drive_by_id(drive_id)
     passenger_order_ids = [int(passenger_order["id"]) for passenger_order in driver_drive.passenger_orders]
     passenger_orders: list[PassengerDriveOrder] = await passenger_service.get_by_ids(passenger_order_ids)
 
-    return await _order_details(drive_id, passenger_orders, driver_drive, users_service, user)
+    return await _order_details(drive_id, passenger_orders, driver_drive, users_service, user, directions_service)
 
 
 @router.get("/drive-details/{drive_id}")
@@ -186,33 +380,37 @@ async def order_details(
     driver_service: DriverService = Depends(get_driver_service),
     users_service: UserHandlerService = Depends(get_user_handler_service),
     user: AuthenticatedUser = Depends(authenticated_user),
+    directions_service: DirectionsService = Depends(get_directions_service),
 ) -> DriveDetails:
 
     passenger_orders: list[PassengerDriveOrder] = await passenger_service.get_by_drive_id(drive_id=drive_id)
     driver_drive = await driver_service.get_driver_drive_by_id(drive_id=drive_id)
-    return await _order_details(drive_id, passenger_orders, driver_drive, users_service, user)
+    return await _order_details(drive_id, passenger_orders, driver_drive, users_service, user, directions_service)
 
 
-async def _add_phone_and_name_to_order_locations(passengers_order_locations: list[OrderLocation], token: str, users_service: UserHandlerService):
-    found_users: dict[str, UserHandlerGetByEmailResponse] = {}
+def _add_phone_and_name_to_order_locations(passengers_order_locations: list[OrderLocation], found_users: dict[str, UserHandlerGetByEmailResponse]):
     for passengers_order_location in passengers_order_locations:
-        email = passengers_order_location.user_email
-        if email not in found_users:
-            found_users[email] = await users_service.get_user_by_email(email, token)
-        user = found_users[email].result
+        user = found_users[passengers_order_location.user_email].result
         passengers_order_location.name = user.full_name
         passengers_order_location.phone = user.phone_number
     return passengers_order_locations
 
 
-async def _order_details(drive_id: str, passenger_orders: list[PassengerDriveOrder], driver_drive: DriverDriveOrder, users_service: UserHandlerService, driver: AuthenticatedUser) -> DriveDetails:
+async def _order_details(drive_id: str, passenger_orders: list[PassengerDriveOrder], driver_drive: DriverDriveOrder, users_service: UserHandlerService, driver: AuthenticatedUser, directions_service: DirectionsService) -> DriveDetails:
     if not passenger_orders or not driver_drive:
         raise HTTPException(
             status_code=HTTPStatus.NOT_ACCEPTABLE, detail={"message": "Drive id not exists"}
         )
 
     order_locations = []
-    driver_user = await users_service.get_user_by_email(driver.email, driver.token)
+    current_location = Geocode(latitude=driver_drive.current_location[0], longitude=driver_drive.current_location[1])
+    (passengers_order_locations, total_price), found_users = await asyncio.gather(
+        build_order_locations_list(
+            current_location=current_location, other_drives=passenger_orders, directions_service=directions_service
+        ),
+        users_service.get_users_by_email([driver.email] + [order.email for order in passenger_orders], driver.token),
+    )
+    driver_user = found_users[driver.email]
     driver_order_location = OrderLocation(
         user_email=driver_drive.driver_id,
         is_driver=True,
@@ -224,10 +422,7 @@ async def _order_details(drive_id: str, passenger_orders: list[PassengerDriveOrd
     )
     order_locations.append(driver_order_location)
 
-    current_location = Geocode(latitude=driver_drive.current_location[0], longitude=driver_drive.current_location[1])
-    passengers_order_locations, total_price = await build_order_locations_list(current_location=current_location, other_drives=passenger_orders)
-
-    passengers_order_locations = await _add_phone_and_name_to_order_locations(passengers_order_locations, driver.token, users_service)
+    passengers_order_locations = _add_phone_and_name_to_order_locations(passengers_order_locations, found_users)
     order_locations.extend(passengers_order_locations)
 
     return DriveDetails(
@@ -255,9 +450,7 @@ async def finish_drive(
 
 
 async def _finish_passenger_orders(drive_id, passenger_service):
-    passenger_orders = await passenger_service.get_by_drive_id_iter(drive_id=drive_id)
-    for passenger_order in passenger_orders:
-        await passenger_service.set_status_to_drive_order(passenger_order.id, PassengerDriveOrderStatus.FINISHED)
+    await passenger_service.finish_drive_orders(drive_id=drive_id)
 
 
 def _validate_drive_for_finish(drive, user):
@@ -276,34 +469,15 @@ def get_suggestions_with_total_value_volume(suggestions: SuggestedSolution) -> S
     return suggestions
 
 
-def is_order_acceptable(order: Any, limits: dict[Limit, LimitValues]) -> bool:
-    for limit, limit_values in limits.items():
-        limit_function = LIMITS_MAPPING[limit.value]
-        if not limit_function(order, limit_values):
-            return False
-    return True
-
-
-async def get_top_candidates(
+async def get_knapsack_items(
     current_location,
-    passenger_service: PassengerService,
-    limits: dict[Limit, LimitValues],
-    driver_id: str,
-    directions_service: DirectionsService,
-    cost_estimation_service: CostEstimationService,
-    time_service: TimeService,
+    orders: list[TopCandidate],
+    profit_estimation_service: ProfitEstimationService,
 ) -> list[KnapsackItem]:
     candidates = []
-    orders = await passenger_service.get_top_order_candidates(
-        candidates_amount=CANDIDATES_AMOUNT, current_location=current_location, driver_id=driver_id
-    )
     current_location_as_geo: Geocode = Geocode(latitude=current_location[0], longitude=current_location[1])
-    for order in orders:
-        if not is_order_acceptable(order=order, limits=limits):
-            await passenger_service.release_order_from_freeze(driver_id, order.id)
-            continue
-        profit = await _estimate_driver_profit(cost_estimation_service, current_location_as_geo, directions_service,
-                                               order, time_service)
+    profits = await profit_estimation_service.estimate_profits(current_location_as_geo, orders)
+    for order, profit in zip(orders, profits):
         profit = max(profit, 1)
         item = KnapsackItem(id=str(order.id), volume=order.passengers_amount, value=profit)
         candidates.append(item)
@@ -311,89 +485,25 @@ async def get_top_candidates(
     return candidates
 
 
-async def _estimate_driver_profit(cost_estimation_service: CostEstimationService, driver_location: Geocode, directions_service: DirectionsService, order: TopCandidate,
-                                  time_service):
-    passenger_start_point: Geocode = Geocode(latitude=order.source_location[0], longitude=order.source_location[1])
-    directions = await directions_service.get_directions(driver_location, passenger_start_point)
-    arrival_cost = cost_estimation_service.estimate_cost(time_service.now(), directions)
-    return order.estimated_cost - arrival_cost
-
-
-async def get_next_drive(current_location: Geocode, other_drives: list[PassengerDriveOrder]) -> PassengerDriveOrder:
-    closest_drive = None
-    min_distance = float('inf')
-
-    for drive in other_drives:
-        distance = calculate_distance(current_location.latitude, current_location.longitude, drive.source_location[0], drive.source_location[1])
-
-        if distance < min_distance:
-            min_distance = distance
-            closest_drive = drive
+async def build_order_locations_list(current_location: Geocode, other_drives: list[PassengerDriveOrder], directions_service: DirectionsService):
+    # Matrix indexes: 0 is the current location, then every passenger's pick up location and then the drop locations
+    pickup_locations = [Geocode(latitude=d.source_location[0], longitude=d.source_location[1]) for d in other_drives]
+    drop_locations = [Geocode(latitude=d.dest_location[0], longitude=d.dest_location[1]) for d in other_drives]
+    locations = [current_location] + pickup_locations + drop_locations
+    durations_seconds = (await directions_service.get_matrix(locations, locations)).durations_seconds
+    requests = [(1 + i, 1 + len(other_drives) + i) for i in range(len(other_drives))]
+    route = await asyncio.to_thread(plan_route, durations_seconds, requests)
 
-    return closest_drive
-
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    # Convert latitude and longitude from degrees to radians
-    lat1 = math.radians(lat1)
-    lon1 = math.radians(lon1)
-    lat2 = math.radians(lat2)
-    lon2 = math.radians(lon2)
-
-    # Haversine formula
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    radius_of_earth = 6371  # Earth's radius in kilometers
-    distance = radius_of_earth * c
-
-    return distance
-
-
-async def build_order_locations_list(current_location: Geocode, other_drives: list[PassengerDriveOrder]):
-    total_price = 0
     drive_list = []
-    remaining_pickup_drives: list[PassengerDriveOrder] = other_drives.copy()
-    remaining_drop_drives: list[PassengerDriveOrder] = other_drives.copy()
-
-    while remaining_pickup_drives:
-        next_drive: PassengerDriveOrder = await get_next_drive(current_location, remaining_pickup_drives)
-        if next_drive:
-            total_price += next_drive.estimated_cost
-            next_order_location = OrderLocation(
-                user_email=next_drive.email,
-                is_driver=False,
-                is_start_address=True,
-                address=Geocode(latitude=next_drive.source_location[0], longitude=next_drive.source_location[1]),
-                price=next_drive.estimated_cost
-            )
-
-            drive_list.append(next_order_location)
-            current_location = Geocode(latitude=next_drive.source_location[0], longitude=next_drive.source_location[1])
-            remaining_pickup_drives.remove(next_drive)
-        else:
-            break
-
-    while remaining_drop_drives:
-        next_drive: PassengerDriveOrder = await get_next_drive(current_location, remaining_drop_drives)
-        if next_drive:
-            next_order_location = OrderLocation(
-                user_email=next_drive.email,  # driver_drive.email,
-                is_driver=False,
-                is_start_address=False,
-                address=Geocode(latitude=next_drive.dest_location[0], longitude=next_drive.dest_location[1]),
-                price=next_drive.estimated_cost
-            )
-
-            drive_list.append(next_order_location)
-            current_location = Geocode(latitude=next_drive.dest_location[0], longitude=next_drive.dest_location[1])
-            remaining_drop_drives.remove(next_drive)
-        else:
-            break
-
-    return drive_list, total_price
-
-
-
-
+    for stop in route:
+        is_start_address = stop <= len(other_drives)
+        drive = other_drives[(stop - 1) % len(other_drives)]
+        drive_list.append(OrderLocation(
+            user_email=drive.email,
+            is_driver=False,
+            is_start_address=is_start_address,
+            address=locations[stop],
+            price=drive.estimated_cost
+        ))
+
+    return drive_list, sum(d.estimated_cost for d in other_drives)
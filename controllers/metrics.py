@@ -0,0 +1,88 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from component_factory import (
+    create_db_engine,
+    get_candidate_search,
+    get_directions_cache,
+    get_geocoding_cache,
+    get_token_cache,
+    get_user_profile_cache,
+)
+from model.responses.metrics import (
+    DbPoolMetricsResponse,
+    CacheMetricsResponse,
+    CandidateSearchMetricsResponse,
+)
+from service.db_pool_metrics import InstrumentedAsyncAdaptedQueuePool
+from service.ttl_cache import TtlCache
+
+router = APIRouter()
+
+
+@router.get("/db-pool")
+async def db_pool_metrics(engine: AsyncEngine = Depends(create_db_engine)) -> DbPoolMetricsResponse:
+    pool = engine.pool
+    if not isinstance(pool, InstrumentedAsyncAdaptedQueuePool):
+        return DbPoolMetricsResponse(pooled=False)
+
+    return DbPoolMetricsResponse(
+        pooled=True,
+        size=pool.size(),
+        checked_out=pool.checkedout(),
+        overflow=pool.overflow(),
+        checkouts=pool.metrics.checkouts,
+        timeouts=pool.metrics.timeouts,
+        average_wait_seconds=pool.metrics.average_wait_seconds,
+        max_wait_seconds=pool.metrics.max_wait_seconds,
+    )
+
+
+@router.get("/directions-cache")
+async def directions_cache_metrics() -> CacheMetricsResponse:
+    return _cache_metrics(get_directions_cache())
+
+
+@router.get("/geocoding-cache")
+async def geocoding_cache_metrics() -> CacheMetricsResponse:
+    return _cache_metrics(get_geocoding_cache())
+
+
+@router.get("/token-cache")
+async def token_cache_metrics() -> CacheMetricsResponse:
+    return _cache_metrics(get_token_cache())
+
+
+@router.get("/user-profile-cache")
+async def user_profile_cache_metrics() -> CacheMetricsResponse:
+    return _cache_metrics(get_user_profile_cache())
+
+
+@router.get("/candidate-search")
+async def candidate_search_metrics() -> CandidateSearchMetricsResponse:
+    candidate_search = get_candidate_search()
+    return CandidateSearchMetricsResponse(
+        rings_km=list(candidate_search.rings_km),
+        pool_size=candidate_search.pool_size,
+        budget_seconds=candidate_search.budget_seconds,
+        searches=candidate_search.searches,
+        average_rings=candidate_search.average_rings,
+        average_candidates=candidate_search.average_candidates,
+        full_pools=candidate_search.full_pools,
+        exhausted_budgets=candidate_search.exhausted_budgets,
+    )
+
+
+def _cache_metrics(cache: Optional[TtlCache]) -> CacheMetricsResponse:
+    if cache is None:
+        return CacheMetricsResponse(enabled=False)
+    return CacheMetricsResponse(
+        enabled=True,
+        size=len(cache),
+        max_size=cache.max_size,
+        hits=cache.hits,
+        misses=cache.misses,
+        hit_ratio=cache.hit_ratio,
+    )
@@ -1,5 +1,6 @@
 from datetime import datetime
 from http import HTTPStatus
+from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException
 
@@ -49,24 +50,26 @@ async def handle_add_drive_order_request(
     directions_service: DirectionsService = Depends(get_directions_service),
     user: AuthenticatedUser = Depends(authenticated_user),
 ) -> DriveOrderResponse:
-    cost_estimation = await _estimate_cost(cost_estimation_service, directions_service, order_request, time_service)
+    directions = await _get_directions(directions_service, order_request)
+    cost_estimation = cost_estimation_service.estimate_cost(time_service.now(), directions)
 
-    drive_order = await add_drive_order(user.email, order_request, passenger_service, cost_estimation, time_service.utcnow())
+    drive_order = await add_drive_order(
+        user.email, order_request, passenger_service, cost_estimation, time_service.utcnow(), directions
+    )
     return _to_drive_order_response(drive_order, time_service)
 
 
-async def _estimate_cost(cost_estimation_service, directions_service, order_request, time_service):
+async def _get_directions(directions_service: DirectionsService, order_request: PassengerDriveOrderRequest):
     directions: DirectionsApiResponse = await directions_service.get_directions(
         Geocode(latitude=order_request.parameter.startLat, longitude=order_request.parameter.startLon),
         Geocode(latitude=order_request.parameter.destinationLat, longitude=order_request.parameter.destinationLon),
     )
-    cost_estimation = cost_estimation_service.estimate_cost(time_service.now(), directions)
-    return cost_estimation
+    return directions
 
 
 async def add_drive_order(
     user_id: str, order_request: PassengerDriveOrderRequest, passenger_service: PassengerService, cost_estimation: float,
-    time: datetime
+    time: datetime, directions: Optional[DirectionsApiResponse] = None
 ) -> PassengerDriveOrder:
     db_drive_order = PassengerDriveOrder(
         email=user_id,
@@ -74,6 +77,8 @@ async def add_drive_order(
         source_location=[order_request.parameter.startLat, order_request.parameter.startLon],
         dest_location=[order_request.parameter.destinationLat, order_request.parameter.destinationLon],
         estimated_cost=cost_estimation,
+        road_distance_meters=directions.distance_meters if directions else None,
+        road_duration_seconds=directions.duration_seconds if directions else None,
         time=time
     )
 
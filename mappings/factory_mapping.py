@@ -1,7 +1,36 @@
-from mappings.utils import limit_by_range
-from model.requests.driver import Limit
+from typing import Any
+
+from mappings.utils import limit_by_range, limit_by_range_sql
+from model.requests.driver import Limit, LimitValues
 
 LIMITS_MAPPING = {
     Limit.pick_up_distance.value: lambda order, limit_values: limit_by_range(order.distance_from_driver, limit_values),
     Limit.ride_distance.value: lambda order, limit_values: limit_by_range(order.distance, limit_values),
 }
+
+# Same limits as LIMITS_MAPPING, compiled into the candidates query. Expressions refer to the candidate order's metrics.
+LIMITS_SQL_MAPPING = {
+    Limit.pick_up_distance.value: lambda limit_values, param_prefix: limit_by_range_sql(
+        "metrics.distance_from_driver", limit_values, param_prefix
+    ),
+    Limit.ride_distance.value: lambda limit_values, param_prefix: limit_by_range_sql(
+        "metrics.distance", limit_values, param_prefix
+    ),
+}
+
+
+def is_order_acceptable(order: Any, limits: dict[Limit, LimitValues]) -> bool:
+    for limit, limit_values in limits.items():
+        limit_function = LIMITS_MAPPING[limit.value]
+        if not limit_function(order, limit_values):
+            return False
+    return True
+
+
+def limits_to_sql_filter(limits: dict[Limit, LimitValues]) -> tuple[str, dict]:
+    clauses, params = [], {}
+    for limit, limit_values in limits.items():
+        limit_clauses, limit_params = LIMITS_SQL_MAPPING[limit.value](limit_values, f"limit_{limit.value}")
+        clauses.extend(limit_clauses)
+        params.update(limit_params)
+    return " AND ".join(clauses) or "TRUE", params
@@ -9,3 +9,17 @@ def limit_by_range(value: Any, limit_values: LimitValues) -> bool:
     if limit_values.max and value > limit_values.max:
         return False
     return True
+
+
+def limit_by_range_sql(expression: str, limit_values: LimitValues, param_prefix: str) -> tuple[list[str], dict]:
+    """
+    SQL equivalent of limit_by_range. Returns the WHERE clauses and their bind parameters.
+    """
+    clauses, params = [], {}
+    if limit_values.min:
+        clauses.append(f"{expression} >= :{param_prefix}_min")
+        params[f"{param_prefix}_min"] = limit_values.min
+    if limit_values.max:
+        clauses.append(f"{expression} <= :{param_prefix}_max")
+        params[f"{param_prefix}_max"] = limit_values.max
+    return clauses, params
@@ -20,6 +20,63 @@ class Config(NamedTuple):
     geocoding_api_key: str
     directions_api_url: str
 
+    db_pool_enabled: bool = True
+    db_pool_size: int = 5
+    db_pool_max_overflow: int = 10
+    db_pool_timeout_seconds: float = 30
+    db_pool_pre_ping: bool = True
+    db_pool_recycle_seconds: int = 1800
+    db_statement_cache_size: int = 100
+    cache_db_pool_size: int = 2
+    cache_db_pool_timeout_seconds: float = 0.5
+
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 30
+    http2_enabled: bool = False
+    users_handler_timeout_seconds: float = 5
+    subscriptions_handler_timeout_seconds: float = 5
+    knapsack_timeout_seconds: float = 70
+    geocoding_timeout_seconds: float = 5
+    directions_timeout_seconds: float = 5
+
+    directions_matrix_api_url: Optional[str] = None
+    directions_cache_enabled: bool = True
+    directions_cache_size: int = 10000
+    directions_cache_ttl_seconds: float = 900
+    directions_cache_precision: int = 4
+    directions_persistent_cache_enabled: bool = True
+    directions_persistent_cache_ttl_seconds: float = 604800
+    directions_cache_time_bucket_hours: int = 1
+
+    token_cache_enabled: bool = True
+    token_cache_size: int = 10000
+    token_cache_ttl_seconds: float = 60
+    token_signing_key_location: Optional[str] = None
+
+    knapsack_local_max_items: int = 12
+    knapsack_local_solutions_amount: int = 3
+    knapsack_local_solution_ttl_seconds: float = 60
+
+    user_profile_cache_enabled: bool = True
+    user_profile_cache_size: int = 10000
+    user_profile_cache_ttl_seconds: float = 300
+
+    geocoding_cache_enabled: bool = True
+    geocoding_cache_size: int = 10000
+    geocoding_cache_ttl_seconds: float = 86400
+    geocoding_persistent_cache_enabled: bool = False
+    geocoding_persistent_cache_ttl_seconds: float = 2592000
+
+    open_orders_index_enabled: bool = True
+    open_orders_index_refresh_seconds: float = 30
+
+    candidate_search_rings_km: tuple[float, ...] = (1, 3, 10)
+    candidate_pool_size: int = 10
+    candidate_search_budget_seconds: float = 1
+
+    suggestion_jobs_ttl_seconds: float = 300
+
 
 class TimeRange(NamedTuple):
     day: int  # Sunday: 6, Monday: 0, Tuesday: 1, Wednesday: 2, Thursday: 3, Friday: 4, Saturday: 5
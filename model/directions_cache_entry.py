@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, Float, DateTime, BigInteger
+
+from model.base_db import Base
+
+
+class DirectionsCacheEntry(Base):
+    __tablename__ = "directions_cache"
+    # Only a cache, so it is not worth the WAL writes. Postgres truncates unlogged tables after a crash.
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    source_cell = Column(BigInteger, primary_key=True)  # see service.geo_utils.quantized_cell
+    dest_cell = Column(BigInteger, primary_key=True)
+    time_of_week_bucket = Column(Integer, primary_key=True)
+    distance_meters = Column(Float)
+    duration_seconds = Column(Float)
+    updated_at = Column(DateTime)
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Float, DateTime, String, Boolean
+
+from model.base_db import Base
+
+
+class GeocodingCacheEntry(Base):
+    __tablename__ = "geocoding_cache"
+
+    address = Column(String, primary_key=True)  # see service.geocoding_service.canonical_address
+    lat = Column(Float)
+    lon = Column(Float)
+    is_single_result = Column(Boolean)
+    updated_at = Column(DateTime)
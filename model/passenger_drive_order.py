@@ -1,12 +1,14 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, Float, String, Enum, ARRAY, DateTime
+from sqlalchemy import Column, Integer, Float, String, ARRAY, DateTime, BigInteger, Index, literal
+from sqlalchemy import Enum as SqlEnum
 from enum import Enum
 
 
 from model.base_db import Base
 
 PASSENGER_DRIVE_ORDER_TABLE = "passenger_drive_orders"
+PASSENGER_DRIVE_ORDER_STATUS_CONSTRAINT = "passenger_drive_order_status"
 
 
 class PassengerDriveOrderStatus(str, Enum):
@@ -21,11 +23,54 @@ class PassengerDriveOrder(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     email = Column(String)
     passengers_amount = Column(Integer)
-    status = Column(String, default=PassengerDriveOrderStatus.NEW)
+    status = Column(
+        SqlEnum(
+            PassengerDriveOrderStatus,
+            native_enum=False,
+            create_constraint=True,
+            length=16,
+            name=PASSENGER_DRIVE_ORDER_STATUS_CONSTRAINT,
+        ),
+        default=PassengerDriveOrderStatus.NEW,
+    )
     source_location = Column(ARRAY(Float, dimensions=1))
     dest_location = Column(ARRAY(Float, dimensions=1))
+    source_cell = Column(BigInteger)  # see service.geo_utils.grid_cell
+    trip_distance_km = Column(Float)  # straight line distance from source to destination
+    trip_bearing = Column(Float)  # degrees clockwise from north, from source to destination
+    road_distance_meters = Column(Float)
+    road_duration_seconds = Column(Float)
     drive_id = Column(String, default=None)
     frozen_by = Column(String)  # driver's email
     estimated_cost = Column(Float)
     estimated_arrival_time = Column(DateTime)
     time = Column(DateTime)
+
+    __table_args__ = (
+        # One partial index per lifecycle state that is looked up by status
+        Index(
+            "ix_passenger_drive_orders_new_source_cell_trip_distance",
+            "source_cell",
+            "trip_distance_km",
+            postgresql_where=(status == literal(PassengerDriveOrderStatus.NEW.value)),
+        ),
+        Index(
+            "ix_passenger_drive_orders_frozen_frozen_by",
+            "frozen_by",
+            postgresql_where=(status == literal(PassengerDriveOrderStatus.FROZEN.value)),
+        ),
+        Index(
+            "ix_passenger_drive_orders_active_drive_id",
+            "drive_id",
+            postgresql_where=(status == literal(PassengerDriveOrderStatus.ACTIVE.value)),
+        ),
+        Index("ix_passenger_drive_orders_drive_id_email", "drive_id", "email"),
+        Index("ix_passenger_drive_orders_email_id", "email", "id"),
+    )
+
+
+def status_is(status: PassengerDriveOrderStatus):
+    """
+    Status filter rendered as a literal rather than a bind parameter, so the planner can match the partial indexes.
+    """
+    return PassengerDriveOrder.status == literal(status, PassengerDriveOrder.status.type, literal_execute=True)
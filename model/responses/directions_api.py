@@ -4,3 +4,15 @@ from model.base_dto import BaseModel
 class DirectionsApiResponse(BaseModel):
     distance_meters: float
     duration_seconds: float
+
+
+class DirectionsMatrixResponse(BaseModel):
+    # Row per source, column per destination
+    distances_meters: list[list[float]]
+    durations_seconds: list[list[float]]
+
+    def get(self, source_index: int, destination_index: int) -> DirectionsApiResponse:
+        return DirectionsApiResponse(
+            distance_meters=self.distances_meters[source_index][destination_index],
+            duration_seconds=self.durations_seconds[source_index][destination_index],
+        )
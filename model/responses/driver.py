@@ -1,7 +1,10 @@
 from datetime import datetime
+from enum import Enum
+from typing import Optional
 
 from model.base_dto import BaseModel
 from model.requests.knapsack import KnapsackItem
+from model.responses.knapsack import SuggestedSolution
 from model.responses.geocode import Geocode
 
 
@@ -25,3 +28,16 @@ class DriveDetails(BaseModel):
     id: str
     order_locations: list[OrderLocation]
     total_price: int
+
+
+class SuggestionJobStatus(str, Enum):
+    PENDING = "PENDING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+class SuggestionJobResponse(BaseModel):
+    job_id: str
+    status: SuggestionJobStatus
+    result: Optional[SuggestedSolution] = None
+    error: Optional[str] = None
@@ -0,0 +1,34 @@
+from typing import Optional
+
+from model.base_dto import BaseModel
+
+
+class DbPoolMetricsResponse(BaseModel):
+    pooled: bool
+    size: Optional[int] = None
+    checked_out: Optional[int] = None
+    overflow: Optional[int] = None
+    checkouts: int = 0
+    timeouts: int = 0
+    average_wait_seconds: float = 0
+    max_wait_seconds: float = 0
+
+
+class CacheMetricsResponse(BaseModel):
+    enabled: bool
+    size: int = 0
+    max_size: int = 0
+    hits: int = 0
+    misses: int = 0
+    hit_ratio: float = 0
+
+
+class CandidateSearchMetricsResponse(BaseModel):
+    rings_km: list[float]
+    pool_size: int
+    budget_seconds: float
+    searches: int
+    average_rings: float
+    average_candidates: float
+    full_pools: int
+    exhausted_budgets: int
@@ -1,10 +1,13 @@
 import dataclasses
+from typing import Optional
 
 
 @dataclasses.dataclass
 class TopCandidate:
+    distance_from_driver: float
     distance: float
     id: int
     passengers_amount: int
     source_location: list[float]
     estimated_cost: float
+    dest_location: Optional[list[float]] = None
@@ -2,10 +2,18 @@ import asyncio
 
 from fastapi import FastAPI, Depends
 
-from component_factory import get_migration_service
+from component_factory import (
+    get_migration_service,
+    get_directions_cache_store,
+    get_geocoding_cache_store,
+    get_suggestion_job_service,
+    open_http_clients,
+    close_http_clients,
+)
 from controllers.geocoding import router as geocoding_router
 from controllers.images import router as images_router
 from controllers.login import router as login_router
+from controllers.metrics import router as metrics_router
 from controllers.passenger import router as passenger_router
 from controllers.rating import router as rating_router
 from controllers.driver import router as driver_router
@@ -23,6 +31,20 @@ logger.info("Finished migrating database. Starting application")
 app = FastAPI()
 
 
+@app.on_event("startup")
+async def startup():
+    open_http_clients()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    for cache_store in (get_directions_cache_store(), get_geocoding_cache_store()):
+        if cache_store is not None:
+            await cache_store.flush()
+    await get_suggestion_job_service().close()
+    await close_http_clients()
+
+
 app.include_router(rating_router, prefix="/rating", tags=["rating"], dependencies=[Depends(authenticated_user)])
 app.include_router(images_router, prefix="/images", tags=["images"])
 app.include_router(users_router, prefix="/users", tags=["users"])
@@ -41,3 +63,4 @@ app.include_router(
     passenger_router, prefix="/passenger", tags=["passenger"], dependencies=[Depends(authenticated_user)]
 )
 app.include_router(driver_router, prefix="/driver", tags=["driver"], dependencies=[Depends(authenticated_user)])
+app.include_router(metrics_router, prefix="/metrics", tags=["metrics"], dependencies=[Depends(authenticated_user)])
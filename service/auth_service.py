@@ -0,0 +1,97 @@
+import base64
+import hashlib
+import hmac
+import json
+from http import HTTPStatus
+from typing import Optional
+
+from fastapi import HTTPException
+
+from service.time_service import TimeService
+from service.ttl_cache import TtlCache
+from service.user_handler_service import UserHandlerService
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def decode_signed_token(token: str, signing_key: str) -> Optional[dict]:
+    """
+    Returns the claims of an HS256 signed JWT, or None when the token is not one or its signature does not match.
+    Expiry is not checked.
+    """
+    try:
+        header_segment, payload_segment, signature_segment = token.split(".")
+        header = json.loads(_b64decode(header_segment))
+        if header.get("alg") != "HS256":
+            return None
+        signing_input = f"{header_segment}.{payload_segment}".encode()
+        expected_signature = hmac.new(signing_key.encode(), signing_input, hashlib.sha256).digest()
+        if not hmac.compare_digest(expected_signature, _b64decode(signature_segment)):
+            return None
+        claims = json.loads(_b64decode(payload_segment))
+    except (ValueError, AttributeError):
+        return None
+    return claims if isinstance(claims, dict) else None
+
+
+def _is_timestamp(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _unauthorized() -> HTTPException:
+    return HTTPException(status_code=HTTPStatus.UNAUTHORIZED, detail="Unauthorized")
+
+
+class AuthService:
+    """
+    Validates tokens without calling the users backend on every request. Signed tokens are verified locally when the
+    signing key is configured, other tokens are validated by the users backend and cached until they expire, but no
+    longer than max_cache_seconds so that revoked tokens are noticed.
+    """
+
+    def __init__(
+        self,
+        user_handler_service: UserHandlerService,
+        time_service: TimeService,
+        cache: Optional[TtlCache[dict]] = None,
+        max_cache_seconds: float = 0,
+        signing_key: Optional[str] = None,
+    ):
+        self._user_handler_service = user_handler_service
+        self._time_service = time_service
+        self._cache = cache
+        self._max_cache_seconds = max_cache_seconds
+        self._signing_key = signing_key
+
+    async def authenticate(self, token: str) -> dict:
+        """
+        Returns the token's claims, raises 401 when the token is invalid or expired.
+        """
+        if self._signing_key:
+            claims = decode_signed_token(token, self._signing_key)
+            # Tokens that are not signed with the configured key, or never expire, fall back to the users backend
+            if claims is not None and "email" in claims and _is_timestamp(claims.get("exp")):
+                if self._seconds_to_expiry(claims) <= 0:
+                    raise _unauthorized()
+                return claims
+
+        key = hashlib.sha256(token.encode()).hexdigest()
+        if self._cache is not None and (claims := self._cache.get(key)) is not None:
+            return claims
+
+        is_token_valid = await self._user_handler_service.validate_token(token)
+        if is_token_valid.code != 200 or is_token_valid.result["is_valid"] is not True:
+            raise _unauthorized()
+
+        claims = is_token_valid.result["token"]
+        if self._cache is not None:
+            self._cache.set(key, claims, ttl_seconds=min(self._max_cache_seconds, self._seconds_to_expiry(claims)))
+        return claims
+
+    def _seconds_to_expiry(self, claims: dict) -> float:
+        expires_at = claims.get("exp")
+        if not _is_timestamp(expires_at):
+            return float("inf")
+        return expires_at - self._time_service.now().timestamp()
@@ -0,0 +1,45 @@
+import time
+
+
+class CandidateSearch:
+    """
+    Schedule of the expanding-radius search for a driver's candidate orders: the rings are searched from the closest
+    one outwards until the pool is full or the time budget is exhausted. A final ring reaches the driver's pick up
+    limit, or any distance when the driver has none.
+    Dense areas are served by the inner rings without freezing far orders, and sparse areas still get candidates.
+    The search metrics are kept per process.
+    """
+
+    def __init__(self, rings_km: tuple[float, ...] = (1, 3, 10), pool_size: int = 10, budget_seconds: float = 1):
+        self.rings_km = tuple(sorted(rings_km))
+        self.pool_size = pool_size
+        self.budget_seconds = budget_seconds
+        self.searches = 0
+        self.rings_searched = 0
+        self.candidates_found = 0
+        self.full_pools = 0
+        self.exhausted_budgets = 0
+
+    def rings(self, max_radius_km: float) -> list[float]:
+        """
+        Ring radiuses to search, capped at the given radius, which is always the last one.
+        """
+        return sorted({min(r, max_radius_km) for r in self.rings_km} | {max_radius_km})
+
+    def is_budget_exhausted(self, started_at: float) -> bool:
+        return time.monotonic() - started_at >= self.budget_seconds
+
+    def record(self, rings_searched: int, candidates: int, pool_size: int, budget_exhausted: bool):
+        self.searches += 1
+        self.rings_searched += rings_searched
+        self.candidates_found += candidates
+        self.full_pools += candidates >= pool_size
+        self.exhausted_budgets += budget_exhausted
+
+    @property
+    def average_rings(self) -> float:
+        return self.rings_searched / self.searches if self.searches else 0.0
+
+    @property
+    def average_candidates(self) -> float:
+        return self.candidates_found / self.searches if self.searches else 0.0
@@ -1,7 +1,80 @@
+import textwrap
+
+from sqlalchemy import inspect, text, Connection
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncConnection
 
 from logger import logger
 from model.base_db import Base
+from model.passenger_drive_order import (
+    PASSENGER_DRIVE_ORDER_TABLE,
+    PASSENGER_DRIVE_ORDER_STATUS_CONSTRAINT,
+    PassengerDriveOrderStatus,
+)
+from service.geo_utils import GRID_CELL_SQL, HAVERSINE_KM_SQL, INITIAL_BEARING_DEGREES_SQL
+
+_TRIP_POINTS = dict(
+    lat1="source_location[1]", lon1="source_location[2]", lat2="dest_location[1]", lon2="dest_location[2]"
+)
+
+_PASSENGER_DRIVE_ORDER_STATUSES = ", ".join(f"'{s.value}'" for s in PassengerDriveOrderStatus)
+
+# Idempotent data migrations, executed after the schema is in sync with the models
+DATA_MIGRATIONS = [
+    textwrap.dedent(
+        f"""
+UPDATE {PASSENGER_DRIVE_ORDER_TABLE}
+SET source_cell = {GRID_CELL_SQL.format(latitude="source_location[1]", longitude="source_location[2]")}
+WHERE source_cell IS NULL AND source_location IS NOT NULL
+"""
+    ),
+    # status used to be a free-form string, matched with ilike
+    textwrap.dedent(
+        f"""
+UPDATE {PASSENGER_DRIVE_ORDER_TABLE}
+SET status = UPPER(REGEXP_REPLACE(status, '^.*\\.', ''))
+WHERE status NOT IN ({_PASSENGER_DRIVE_ORDER_STATUSES})
+"""
+    ),
+    textwrap.dedent(
+        f"""
+DO $$
+BEGIN
+    ALTER TABLE {PASSENGER_DRIVE_ORDER_TABLE} ADD CONSTRAINT {PASSENGER_DRIVE_ORDER_STATUS_CONSTRAINT}
+    CHECK (status IN ({_PASSENGER_DRIVE_ORDER_STATUSES}));
+EXCEPTION
+    WHEN duplicate_object THEN NULL;
+    WHEN check_violation THEN RAISE WARNING 'Found passenger drive orders with unknown status';
+END $$
+"""
+    ),
+    textwrap.dedent(
+        f"""
+UPDATE {PASSENGER_DRIVE_ORDER_TABLE}
+SET
+    trip_distance_km = {HAVERSINE_KM_SQL.format(**_TRIP_POINTS)},
+    trip_bearing = {INITIAL_BEARING_DEGREES_SQL.format(**_TRIP_POINTS)}
+WHERE trip_distance_km IS NULL AND source_location IS NOT NULL AND dest_location IS NOT NULL
+"""
+    ),
+]
+
+
+def _add_missing_columns(conn: Connection):
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            logger.info(f"Adding column {column.name} to table {table.name}")
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS {column.name} {column_type}"))
+
+
+def _create_missing_indexes(conn: Connection):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
 
 
 class DatabaseMigrationService:
@@ -13,5 +86,12 @@ class DatabaseMigrationService:
             async with self._engine.begin() as conn:
                 conn: AsyncConnection
                 await conn.run_sync(Base.metadata.create_all)
+                await conn.run_sync(_add_missing_columns)
+                await conn.run_sync(_create_missing_indexes)
+                for statement in DATA_MIGRATIONS:
+                    await conn.execute(text(statement))
         except Exception as e:
             logger.error("Got unexpected exception while migrating database.", e)
+        finally:
+            # Migration runs on its own event loop, pooled connections must not leak into the application's loop
+            await self._engine.dispose()
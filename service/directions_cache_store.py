@@ -0,0 +1,144 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from logger import logger
+from model.directions_cache_entry import DirectionsCacheEntry
+from model.responses.directions_api import DirectionsApiResponse
+from model.responses.geocode import Geocode
+from service.geo_utils import quantized_cell
+from service.time_service import TimeService
+
+HOURS_IN_WEEK = 7 * 24
+
+
+class DirectionsCacheStore:
+    """
+    Directions cache shared by all workers, kept in an unlogged table.
+    Entries are bucketed by the time of the week since the traffic, and therefore the duration, depends on it.
+    Lookups and writes use their own short sessions, so they can run concurrently and writes do not delay the request.
+    The sessions should come from a small pool separate from the requests' one, with a short checkout timeout, since
+    the caller usually holds a connection of the requests' pool already.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        time_service: TimeService,
+        precision: int,
+        time_bucket_hours: int,
+        ttl_seconds: float,
+    ):
+        self._session_maker = session_maker
+        self._time_service = time_service
+        self._precision = precision
+        self._time_bucket_hours = time_bucket_hours
+        self._ttl_seconds = ttl_seconds
+        self._pending_writes: set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+
+    def time_of_week_bucket(self, time: datetime) -> int:
+        return (time.weekday() * 24 + time.hour) // self._time_bucket_hours
+
+    def _cells(self, source: Geocode, destination: Geocode) -> tuple[int, int]:
+        return (
+            quantized_cell(source.latitude, source.longitude, self._precision),
+            quantized_cell(destination.latitude, destination.longitude, self._precision),
+        )
+
+    async def get(self, source: Geocode, destination: Geocode) -> Optional[DirectionsApiResponse]:
+        return (await self.get_many([(source, destination)]))[0]
+
+    async def get_many(self, legs: list[tuple[Geocode, Geocode]]) -> list[Optional[DirectionsApiResponse]]:
+        """
+        Looks up all the (source, destination) legs in a single query. Results are in the order of the legs.
+        """
+        cells = [self._cells(source, destination) for source, destination in legs]
+        bucket = self.time_of_week_bucket(self._time_service.now())
+        try:
+            async with self._session_maker() as session:
+                res = await session.execute(
+                    select(
+                        DirectionsCacheEntry.source_cell,
+                        DirectionsCacheEntry.dest_cell,
+                        DirectionsCacheEntry.distance_meters,
+                        DirectionsCacheEntry.duration_seconds,
+                    ).where(
+                        tuple_(DirectionsCacheEntry.source_cell, DirectionsCacheEntry.dest_cell).in_(list(set(cells))),
+                        DirectionsCacheEntry.time_of_week_bucket == bucket,
+                        DirectionsCacheEntry.updated_at
+                        > self._time_service.utcnow() - timedelta(seconds=self._ttl_seconds),
+                    )
+                )
+                rows = {(row.source_cell, row.dest_cell): row for row in res}
+        except Exception as e:
+            logger.warning(f"Failed reading directions cache: {e}")
+            rows = {}
+
+        results = []
+        for leg_cells in cells:
+            row = rows.get(leg_cells)
+            if row is None:
+                self.misses += 1
+                results.append(None)
+            else:
+                self.hits += 1
+                results.append(
+                    DirectionsApiResponse(distance_meters=row.distance_meters, duration_seconds=row.duration_seconds)
+                )
+        return results
+
+    def put(self, source: Geocode, destination: Geocode, directions: DirectionsApiResponse):
+        self.put_many([(source, destination, directions)])
+
+    def put_many(self, entries: list[tuple[Geocode, Geocode, DirectionsApiResponse]]):
+        """
+        Writes the entries in the background, in a single statement.
+        """
+        # Postgres rejects an upsert which affects the same row twice
+        rows = {self._cells(source, destination): directions for source, destination, directions in entries}
+        task = asyncio.create_task(self._write(self.time_of_week_bucket(self._time_service.now()), rows))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+    async def _write(self, bucket: int, rows: dict[tuple[int, int], DirectionsApiResponse]):
+        updated_at = self._time_service.utcnow()
+        stmt = insert(DirectionsCacheEntry).values(
+            [
+                dict(
+                    source_cell=source_cell,
+                    dest_cell=dest_cell,
+                    time_of_week_bucket=bucket,
+                    distance_meters=directions.distance_meters,
+                    duration_seconds=directions.duration_seconds,
+                    updated_at=updated_at,
+                )
+                for (source_cell, dest_cell), directions in rows.items()
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(DirectionsCacheEntry.__table__.primary_key),
+            set_=dict(
+                distance_meters=stmt.excluded.distance_meters,
+                duration_seconds=stmt.excluded.duration_seconds,
+                updated_at=stmt.excluded.updated_at,
+            ),
+        )
+        try:
+            async with self._session_maker() as session:
+                async with session.begin():
+                    await session.execute(stmt)
+        except Exception as e:
+            logger.warning(f"Failed writing directions cache: {e}")
+
+    async def flush(self):
+        """
+        Waits for the pending background writes.
+        """
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes)
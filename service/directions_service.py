@@ -1,13 +1,16 @@
-import asyncio
 import json
 from http import HTTPStatus
+from typing import Optional
 from unittest.mock import MagicMock
 
 from fastapi import HTTPException
-from httpx import AsyncClient
+from httpx import AsyncClient, Response
 
-from model.responses.directions_api import DirectionsApiResponse
+from model.responses.directions_api import DirectionsApiResponse, DirectionsMatrixResponse
 from model.responses.geocode import Geocode
+from service.directions_cache_store import DirectionsCacheStore
+from service.single_flight import SingleFlight
+from service.ttl_cache import TtlCache
 
 
 def _get_example_directions():
@@ -15,12 +18,149 @@ def _get_example_directions():
         return json.load(f)
 
 
+# 4 decimal places are ~11 meters, well below the accuracy of a phone's location
+DEFAULT_CACHE_PRECISION = 4
+
+DirectionsCacheKey = tuple[float, float, float, float]
+
+
 class DirectionsService:
-    def __init__(self, directions_api_url: str, http_client: AsyncClient):
+    def __init__(
+        self,
+        directions_api_url: str,
+        http_client: AsyncClient,
+        cache: Optional[TtlCache[DirectionsApiResponse]] = None,
+        cache_precision: int = DEFAULT_CACHE_PRECISION,
+        store: Optional[DirectionsCacheStore] = None,
+        matrix_api_url: Optional[str] = None,
+        single_flight: Optional[SingleFlight] = None,
+    ):
         self._directions_api_url: str = directions_api_url
+        # ORS serves the matrix of a profile next to its directions, e.g. /v2/matrix/driving-car
+        self._matrix_api_url: str = matrix_api_url or (
+            directions_api_url and directions_api_url.replace("/directions/", "/matrix/")
+        )
         self._client: AsyncClient = http_client
+        self._cache = cache
+        self._cache_precision = cache_precision
+        self._store = store
+        self._single_flight = single_flight
+
+    async def get_matrix(self, sources: list[Geocode], destinations: list[Geocode]) -> DirectionsMatrixResponse:
+        """
+        Gets the directions from every source to every destination. The legs missing from the cache are looked up in
+        the store, and the ones missing there too are fetched in a single matrix api call.
+        """
+        if not sources or not destinations:
+            return DirectionsMatrixResponse(
+                distances_meters=[[] for _ in sources], durations_seconds=[[] for _ in sources]
+            )
+
+        legs: dict[tuple[int, int], Optional[DirectionsApiResponse]] = {
+            (i, j): self._cache.get(self._cache_key(source, destination)) if self._cache is not None else None
+            for i, source in enumerate(sources)
+            for j, destination in enumerate(destinations)
+        }
+        missing = [leg for leg, directions in legs.items() if directions is None]
+        if missing and self._store is not None:
+            stored = await self._store.get_many([(sources[i], destinations[j]) for i, j in missing])
+            for (i, j), directions in zip(missing, stored):
+                if directions is not None:
+                    legs[(i, j)] = directions
+                    self._cache_directions(sources[i], destinations[j], directions)
+            missing = [leg for leg in missing if legs[leg] is None]
+
+        if missing:
+            # Fetches the sub matrix covering the missing legs, it may include a few legs which were found
+            missing_sources = sorted({i for i, _ in missing})
+            missing_destinations = sorted({j for _, j in missing})
+            fetched = await self._fetch_matrix_once(
+                [sources[i] for i in missing_sources], [destinations[j] for j in missing_destinations]
+            )
+            fetched_legs = []
+            for row, i in enumerate(missing_sources):
+                for col, j in enumerate(missing_destinations):
+                    legs[(i, j)] = fetched.get(row, col)
+                    self._cache_directions(sources[i], destinations[j], legs[(i, j)])
+                    fetched_legs.append((sources[i], destinations[j], legs[(i, j)]))
+            if self._store is not None:
+                self._store.put_many(fetched_legs)
+
+        rows = [[legs[(i, j)] for j in range(len(destinations))] for i in range(len(sources))]
+        return DirectionsMatrixResponse(
+            distances_meters=[[directions.distance_meters for directions in row] for row in rows],
+            durations_seconds=[[directions.duration_seconds for directions in row] for row in rows],
+        )
+
+    def _cache_directions(self, source: Geocode, destination: Geocode, directions: DirectionsApiResponse):
+        if self._cache is not None:
+            self._cache.set(self._cache_key(source, destination), directions)
+
+    async def _fetch_matrix_once(
+        self, sources: list[Geocode], destinations: list[Geocode]
+    ) -> DirectionsMatrixResponse:
+        if self._single_flight is None:
+            return await self._fetch_matrix(sources, destinations)
+        key = (
+            "matrix",
+            tuple(self._rounded(source) for source in sources),
+            tuple(self._rounded(destination) for destination in destinations),
+        )
+        return await self._single_flight.do(key, lambda: self._fetch_matrix(sources, destinations))
+
+    async def _fetch_matrix(self, sources: list[Geocode], destinations: list[Geocode]) -> DirectionsMatrixResponse:
+        locations = sources + destinations
+        resp = await self._client.post(
+            self._matrix_api_url,
+            json={
+                "locations": [[location.longitude, location.latitude] for location in locations],
+                "sources": list(range(len(sources))),
+                "destinations": list(range(len(sources), len(locations))),
+                "metrics": ["distance", "duration"],
+            },
+        )
+        json_resp = self._verify_response(resp)
+        if any(value is None for row in json_resp["durations"] + json_resp["distances"] for value in row):
+            raise _unsupported_location_error()
+        return DirectionsMatrixResponse(
+            distances_meters=json_resp["distances"], durations_seconds=json_resp["durations"]
+        )
 
     async def get_directions(self, source: Geocode, destination: Geocode) -> DirectionsApiResponse:
+        key = self._cache_key(source, destination)
+        if self._cache is None:
+            return await self._get_directions_once(key, source, destination)
+
+        directions = self._cache.get(key)
+        if directions is None:
+            directions = await self._get_directions_once(key, source, destination)
+            self._cache.set(key, directions)
+        return directions
+
+    async def _get_directions_once(
+        self, key: DirectionsCacheKey, source: Geocode, destination: Geocode
+    ) -> DirectionsApiResponse:
+        if self._single_flight is None:
+            return await self._get_stored_or_fetch_directions(source, destination)
+        return await self._single_flight.do(key, lambda: self._get_stored_or_fetch_directions(source, destination))
+
+    async def _get_stored_or_fetch_directions(self, source: Geocode, destination: Geocode) -> DirectionsApiResponse:
+        if self._store is None:
+            return await self._fetch_directions(source, destination)
+
+        directions = await self._store.get(source, destination)
+        if directions is None:
+            directions = await self._fetch_directions(source, destination)
+            self._store.put(source, destination, directions)
+        return directions
+
+    def _rounded(self, location: Geocode) -> tuple[float, float]:
+        return round(location.latitude, self._cache_precision), round(location.longitude, self._cache_precision)
+
+    def _cache_key(self, source: Geocode, destination: Geocode) -> DirectionsCacheKey:
+        return self._rounded(source) + self._rounded(destination)
+
+    async def _fetch_directions(self, source: Geocode, destination: Geocode) -> DirectionsApiResponse:
         api_resp = await self._call_directions_api(source, destination)
         summary = api_resp["features"][0]["properties"]["summary"]
         if not summary:
@@ -35,6 +175,10 @@ class DirectionsService:
                 "end": f"{destination.longitude},{destination.latitude}",
             },
         )
+        return self._verify_response(resp)
+
+    @staticmethod
+    def _verify_response(resp: Response) -> dict:
         if resp.status_code != HTTPStatus.OK:
             try:
                 json_resp = resp.json()
@@ -43,12 +187,17 @@ class DirectionsService:
                     status_code=HTTPStatus.INTERNAL_SERVER_ERROR,
                     detail={"message": "Encountered error in directions api"}
                 )
-            if 'error' in json_resp and 'code' in json_resp['error'] and json_resp['error']['code'] == 2010:
-                raise HTTPException(400,
-                                    detail="Your location is not supported. "
-                                           "Please make sure your location is near a car-supporing road "
-                                           "and within the bounds of Israel")
+            # 2010 is returned by directions, 6010 by matrix
+            if 'error' in json_resp and 'code' in json_resp['error'] and json_resp['error']['code'] in (2010, 6010):
+                raise _unsupported_location_error()
             raise HTTPException(
                 status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail={"message": "Encountered error in directions api"}
             )
         return resp.json()
+
+
+def _unsupported_location_error() -> HTTPException:
+    return HTTPException(400,
+                         detail="Your location is not supported. "
+                                "Please make sure your location is near a car-supporing road "
+                                "and within the bounds of Israel")
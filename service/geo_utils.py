@@ -0,0 +1,133 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+KM_PER_LATITUDE_DEGREE = 111.32
+
+# Orders are bucketed into a fixed lat/lon grid (~2.2km per cell side) so nearest-order lookups can use a B-tree
+# on the cell key instead of computing the haversine distance for every row in the table.
+GRID_CELL_DEGREES = 0.02
+_GRID_ROW_OFFSET = int(90 / GRID_CELL_DEGREES)
+_GRID_COL_OFFSET = int(180 / GRID_CELL_DEGREES)
+_GRID_COLS = 2 * _GRID_COL_OFFSET + 1
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def haversine_km_to_many(
+    latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray
+) -> np.ndarray:
+    """
+    Distances from one point to every point of the given coordinate arrays.
+    """
+    return haversine_km_matrix(np.array([latitude]), np.array([longitude]), latitudes, longitudes)[0]
+
+
+def haversine_km_matrix(
+    latitudes1: np.ndarray, longitudes1: np.ndarray, latitudes2: np.ndarray, longitudes2: np.ndarray
+) -> np.ndarray:
+    """
+    Distances between every point of the first coordinate arrays (rows) and every point of the second (columns).
+    """
+    lat1 = np.radians(np.asarray(latitudes1, dtype=float))[:, None]
+    lon1 = np.radians(np.asarray(longitudes1, dtype=float))[:, None]
+    lat2 = np.radians(np.asarray(latitudes2, dtype=float))[None, :]
+    lon2 = np.radians(np.asarray(longitudes2, dtype=float))[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> tuple[float, float, float, float]:
+    """
+    (min latitude, min longitude, max latitude, max longitude) of the box containing the circle around the point.
+    """
+    lat_delta = radius_km / KM_PER_LATITUDE_DEGREE
+    lon_delta = radius_km / (KM_PER_LATITUDE_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    return (
+        max(latitude - lat_delta, -90),
+        max(longitude - lon_delta, -180),
+        min(latitude + lat_delta, 90),
+        min(longitude + lon_delta, 180),
+    )
+
+
+def in_bounding_box(
+    latitudes: np.ndarray, longitudes: np.ndarray, box: tuple[float, float, float, float]
+) -> np.ndarray:
+    """
+    Mask of the points inside the box. Cheaper than computing distances, so it is used to prefilter points.
+    """
+    min_lat, min_lon, max_lat, max_lon = box
+    return (latitudes >= min_lat) & (latitudes <= max_lat) & (longitudes >= min_lon) & (longitudes <= max_lon)
+
+
+def initial_bearing_degrees(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Compass bearing (0-360, clockwise from north) of the great circle path from the first point to the second.
+    """
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    y = math.sin(lon2 - lon1) * math.cos(lat2)
+    x = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(lon2 - lon1)
+    return (math.degrees(math.atan2(y, x)) + 360) % 360
+
+
+def _grid_row(latitude: float) -> int:
+    return math.floor(latitude / GRID_CELL_DEGREES)
+
+
+def _grid_col(longitude: float) -> int:
+    return math.floor(longitude / GRID_CELL_DEGREES)
+
+
+def _to_cell(row: int, col: int) -> int:
+    return (row + _GRID_ROW_OFFSET) * _GRID_COLS + (col + _GRID_COL_OFFSET)
+
+
+def grid_cell(latitude: float, longitude: float) -> int:
+    return _to_cell(_grid_row(latitude), _grid_col(longitude))
+
+
+def quantized_cell(latitude: float, longitude: float, precision: int) -> int:
+    """
+    Key of the point rounded to the given amount of decimal places. Unlike grid_cell, the cell size is not fixed.
+    """
+    scale = 10**precision
+    row = round(latitude * scale) + 90 * scale
+    col = round(longitude * scale) + 180 * scale
+    return row * (360 * scale + 1) + col
+
+
+def grid_cells_within_radius(latitude: float, longitude: float, radius_km: float) -> list[int]:
+    """
+    Returns every grid cell intersecting the bounding box of the circle around the given point.
+    """
+    min_lat, min_lon, max_lat, max_lon = bounding_box(latitude, longitude, radius_km)
+    min_row, max_row = _grid_row(min_lat), _grid_row(max_lat)
+    min_col, max_col = _grid_col(min_lon), _grid_col(max_lon)
+    return [_to_cell(row, col) for row in range(min_row, max_row + 1) for col in range(min_col, max_col + 1)]
+
+
+# SQL equivalent of grid_cell, used to backfill rows created before the column existed
+GRID_CELL_SQL = (
+    f"((FLOOR({{latitude}} / {GRID_CELL_DEGREES})::bigint + {_GRID_ROW_OFFSET}) * {_GRID_COLS} "
+    f"+ (FLOOR({{longitude}} / {GRID_CELL_DEGREES})::bigint + {_GRID_COL_OFFSET}))"
+)
+
+# SQL equivalents of haversine_km and initial_bearing_degrees, used to backfill stored trip metrics
+HAVERSINE_KM_SQL = (
+    f"{EARTH_RADIUS_KM} * 2 * ASIN(SQRT("
+    "POWER(SIN((RADIANS({lat2}) - RADIANS({lat1})) / 2), 2) + "
+    "COS(RADIANS({lat1})) * COS(RADIANS({lat2})) * POWER(SIN((RADIANS({lon2}) - RADIANS({lon1})) / 2), 2)))"
+)
+INITIAL_BEARING_DEGREES_SQL = (
+    "MOD(CAST(DEGREES(ATAN2("
+    "SIN(RADIANS({lon2}) - RADIANS({lon1})) * COS(RADIANS({lat2})), "
+    "COS(RADIANS({lat1})) * SIN(RADIANS({lat2})) - "
+    "SIN(RADIANS({lat1})) * COS(RADIANS({lat2})) * COS(RADIANS({lon2}) - RADIANS({lon1}))"
+    ")) + 360 AS NUMERIC), 360)"
+)
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from logger import logger
+from model.geocoding_cache_entry import GeocodingCacheEntry
+from model.position import GeocodingResult, Position
+from service.time_service import TimeService
+
+
+class GeocodingCacheStore:
+    """
+    Geocoding results kept in the database, so they survive restarts and are shared by all workers.
+    Lookups and writes use their own short sessions, and writes do not delay the request.
+    """
+
+    def __init__(self, session_maker: async_sessionmaker[AsyncSession], time_service: TimeService, ttl_seconds: float):
+        self._session_maker = session_maker
+        self._time_service = time_service
+        self._ttl_seconds = ttl_seconds
+        self._pending_writes: set[asyncio.Task] = set()
+
+    async def get(self, address: str) -> Optional[GeocodingResult]:
+        try:
+            async with self._session_maker() as session:
+                res = await session.execute(
+                    select(GeocodingCacheEntry).where(
+                        GeocodingCacheEntry.address == address,
+                        GeocodingCacheEntry.updated_at
+                        > self._time_service.utcnow() - timedelta(seconds=self._ttl_seconds),
+                    )
+                )
+                entry: Optional[GeocodingCacheEntry] = res.scalars().first()
+        except Exception as e:
+            logger.warning(f"Failed reading geocoding cache: {e}")
+            return None
+
+        if entry is None:
+            return None
+        return GeocodingResult(position=Position(lat=entry.lat, lon=entry.lon), is_single_result=entry.is_single_result)
+
+    def put(self, address: str, result: GeocodingResult):
+        """
+        Writes the entry in the background.
+        """
+        task = asyncio.create_task(self._write(address, result))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+    async def _write(self, address: str, result: GeocodingResult):
+        values = dict(
+            lat=result.position.lat,
+            lon=result.position.lon,
+            is_single_result=result.is_single_result,
+            updated_at=self._time_service.utcnow(),
+        )
+        try:
+            async with self._session_maker() as session:
+                async with session.begin():
+                    await session.execute(
+                        insert(GeocodingCacheEntry)
+                        .values(address=address, **values)
+                        .on_conflict_do_update(index_elements=[GeocodingCacheEntry.address], set_=values)
+                    )
+        except Exception as e:
+            logger.warning(f"Failed writing geocoding cache: {e}")
+
+    async def flush(self):
+        """
+        Waits for the pending background writes.
+        """
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes)
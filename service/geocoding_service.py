@@ -1,15 +1,41 @@
+import re
 import urllib.parse
+from typing import Optional
 
 from httpx import AsyncClient
 
 from model.position import Position, GeocodingResult
+from service.geocoding_cache_store import GeocodingCacheStore
+from service.single_flight import SingleFlight
+from service.ttl_cache import TtlCache
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def canonical_address(address: str) -> str:
+    """
+    Cache key of the address: url decoded, case folded, with punctuation and repeated whitespace collapsed.
+    """
+    address = urllib.parse.unquote_plus(address).casefold()
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", address)).strip()
 
 
 class GeocodingService:
-    def __init__(self, http_client: AsyncClient, api_key: str):
+    def __init__(
+        self,
+        http_client: AsyncClient,
+        api_key: str,
+        single_flight: Optional[SingleFlight] = None,
+        cache: Optional[TtlCache[GeocodingResult]] = None,
+        store: Optional[GeocodingCacheStore] = None,
+    ):
         self._client: AsyncClient = http_client
         assert api_key, "Request geocoding api key from team member"
         self._api_key = api_key
+        self._single_flight = single_flight
+        self._cache = cache
+        self._store = store
 
     def _is_address_urlencoded(self, address: str):
         return urllib.parse.unquote_plus(address) != address
@@ -22,6 +48,31 @@ class GeocodingService:
     async def geocode_address(self, address: str) -> GeocodingResult:
         # safe_address = urllib.parse.urlencode(address)
         address_query_param = self.normalize_address_query(address)
+        key = canonical_address(address)
+        if self._cache is not None and (result := self._cache.get(key)) is not None:
+            return result
+
+        if self._single_flight is None:
+            result = await self._get_stored_or_geocode(key, address_query_param)
+        else:
+            result = await self._single_flight.do(key, lambda: self._get_stored_or_geocode(key, address_query_param))
+        # Addresses that were not found are not cached, they are usually typos that are fixed right away
+        if result is not None and self._cache is not None:
+            self._cache.set(key, result)
+        return result
+
+    async def _get_stored_or_geocode(self, key: str, address_query_param: str) -> Optional[GeocodingResult]:
+        if self._store is None:
+            return await self._geocode(address_query_param)
+
+        result = await self._store.get(key)
+        if result is None:
+            result = await self._geocode(address_query_param)
+            if result is not None:
+                self._store.put(key, result)
+        return result
+
+    async def _geocode(self, address_query_param: str) -> Optional[GeocodingResult]:
         resp = await self._client.get(f"/geocode?q={address_query_param}&apiKey={self._api_key}")
         resp.raise_for_status()
 
@@ -1,5 +1,5 @@
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta
 from http import HTTPStatus
 from uuid import uuid4
 
@@ -10,20 +10,68 @@ from logger import logger
 from model.requests.knapsack import KnapsackItem, KnapsackSolverRequest, AcceptSolutionRequest, RejectSolutionsRequest
 from model.responses.knapsack import (
     SuggestedSolution,
+    KnapsackSolution,
     AcceptSolutionResponse,
     RejectSolutionResponse,
     ItemClaimedResponse,
 )
 from model.suggested_solutions_actions_statuses import AcceptResult, RejectResult
+from service.knapsack_solver import solve_top_k
 from service.time_service import TimeService
 
+LOCAL_ALGORITHM = "local_dp"
+# Solutions of the local solver are unknown to the knapsack backend, so they must not be accepted there
+LOCAL_SOLUTION_ID_PREFIX = "local-"
+
 
 class KnapsackService:
-    def __init__(self, http_client: AsyncClient, time_service: TimeService):
+    def __init__(
+        self,
+        http_client: AsyncClient,
+        time_service: TimeService,
+        local_max_items: int = 0,
+        local_solutions_amount: int = 3,
+        local_solution_ttl_seconds: float = 60,
+    ):
         self._client: AsyncClient = http_client
         self._time_service = time_service
+        self._local_max_items = local_max_items
+        self._local_solutions_amount = local_solutions_amount
+        self._local_solution_ttl_seconds = local_solution_ttl_seconds
 
     async def suggest_solution(self, user_id: str, capacity: int, rides: list[KnapsackItem]) -> SuggestedSolution:
+        """
+        Problems with up to local_max_items rides are solved in process, bigger ones by the knapsack backend.
+        local_max_items 0 always uses the backend.
+        """
+        if self._is_local(rides):
+            return self._suggest_local_solution(capacity, rides)
+        return await self._suggest_remote_solution(user_id, capacity, rides)
+
+    def _is_local(self, rides: list[KnapsackItem]) -> bool:
+        # 0 disables the local solver, even for drives without candidates
+        return 0 < self._local_max_items and len(rides) <= self._local_max_items
+
+    def _suggest_local_solution(self, capacity: int, rides: list[KnapsackItem]) -> SuggestedSolution:
+        now = self._time_service.utcnow()
+        solutions = solve_top_k(rides, capacity, self._local_solutions_amount)
+        return SuggestedSolution(
+            time=now,
+            expires_at=now + timedelta(seconds=self._local_solution_ttl_seconds),
+            solutions={
+                f"{LOCAL_SOLUTION_ID_PREFIX}{uuid4()}": KnapsackSolution(
+                    algorithm=LOCAL_ALGORITHM,
+                    items=items,
+                    total_value=sum(item.value for item in items),
+                    total_volume=sum(item.volume for item in items),
+                )
+                for items in solutions
+            },
+        )
+
+    async def _suggest_remote_solution(
+        self, user_id: str, capacity: int, rides: list[KnapsackItem]
+    ) -> SuggestedSolution:
         request = KnapsackSolverRequest(items=rides, volume=capacity, knapsack_id=user_id)
         response = await self._client.post("/knapsack-router/solve", json=request.dict())
         if response.status_code not in (HTTPStatus.OK, HTTPStatus.NO_CONTENT, HTTPStatus.REQUEST_TIMEOUT):
@@ -39,6 +87,9 @@ class KnapsackService:
         return suggestion
 
     async def accept_solution(self, user_id: str, solution_id: str) -> bool:
+        if solution_id.startswith(LOCAL_SOLUTION_ID_PREFIX):
+            # The solution's orders are already frozen for the driver, no one else could have claimed them
+            return True
         request = AcceptSolutionRequest(solution_id=solution_id, knapsack_id=user_id)
         response = await self._client.post("/knapsack-router/accept-solution", json=request.dict())
         response.raise_for_status()
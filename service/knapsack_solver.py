@@ -0,0 +1,30 @@
+"""
+Exact 0/1 knapsack solver for the small problems of a single drive: a handful of seats and a few candidate orders.
+Every capacity keeps its k most valuable item sets, so the k best solutions are found in O(items * capacity * k).
+"""
+import heapq
+
+from model.requests.knapsack import KnapsackItem
+
+
+def solve_top_k(items: list[KnapsackItem], capacity: int, k: int) -> list[list[KnapsackItem]]:
+    """
+    Returns up to k distinct non empty item sets that fit in the capacity, the most valuable first.
+    Ties are broken in favour of fewer items.
+    """
+    # best[c] holds the k best (value, item indexes) with a total volume of at most c
+    best: list[list[tuple[int, tuple[int, ...]]]] = [[(0, ())] for _ in range(capacity + 1)]
+    for index, item in enumerate(items):
+        if item.volume > capacity:
+            continue
+        for c in range(capacity, item.volume - 1, -1):
+            with_item = [(value + item.value, chosen + (index,)) for value, chosen in best[c - item.volume]]
+            best[c] = heapq.nlargest(k + 1, best[c] + with_item, key=_solution_rank)
+
+    solutions = [chosen for _, chosen in best[capacity] if chosen]
+    return [[items[i] for i in chosen] for chosen in solutions[:k]]
+
+
+def _solution_rank(solution: tuple[int, tuple[int, ...]]) -> tuple[int, int]:
+    value, chosen = solution
+    return value, -len(chosen)
@@ -0,0 +1,116 @@
+import math
+import time
+from collections import defaultdict
+from typing import Iterable, Optional, NamedTuple, Callable
+
+import numpy as np
+
+from model.passenger_drive_order import PassengerDriveOrder
+from model.top_candidate import TopCandidate
+from service.geo_utils import grid_cell, grid_cells_within_radius, haversine_km_to_many, bounding_box, in_bounding_box
+
+
+class _OpenOrder(NamedTuple):
+    id: int
+    passengers_amount: int
+    source_location: tuple[float, float]
+    dest_location: tuple[float, float]
+    trip_distance_km: float
+    estimated_cost: float
+
+
+class OpenOrdersIndex:
+    """
+    Process-local grid index of the passenger orders that are waiting for a driver (status NEW).
+
+    PassengerService keeps it up to date on every status transition it performs, and reloads it from the database
+    once it is older than the refresh interval, which bounds the staleness caused by other workers or by rolled back
+    transactions. It is only a hint: orders are always claimed in the database, and only the orders which were
+    claimed are evicted.
+    """
+
+    def __init__(self, refresh_interval_seconds: float):
+        self._refresh_interval_seconds = refresh_interval_seconds
+        self._cells: dict[int, dict[int, _OpenOrder]] = defaultdict(dict)
+        self._order_cells: dict[int, int] = {}
+        self._loaded_at: Optional[float] = None
+
+    @property
+    def is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self._refresh_interval_seconds
+
+    def __len__(self):
+        return len(self._order_cells)
+
+    def load(self, orders: Iterable[PassengerDriveOrder]):
+        self.clear()
+        for order in orders:
+            self.add(order)
+        self._loaded_at = time.monotonic()
+
+    def clear(self):
+        self._cells.clear()
+        self._order_cells.clear()
+
+    def add(self, order: PassengerDriveOrder):
+        self.remove(order.id)
+        cell = grid_cell(order.source_location[0], order.source_location[1])
+        self._cells[cell][order.id] = _OpenOrder(
+            id=order.id,
+            passengers_amount=order.passengers_amount,
+            source_location=(order.source_location[0], order.source_location[1]),
+            dest_location=(order.dest_location[0], order.dest_location[1]),
+            trip_distance_km=order.trip_distance_km,
+            estimated_cost=order.estimated_cost,
+        )
+        self._order_cells[order.id] = cell
+
+    def remove(self, order_id: int):
+        cell = self._order_cells.pop(order_id, None)
+        if cell is None:
+            return
+        orders = self._cells[cell]
+        orders.pop(order_id, None)
+        if not orders:
+            del self._cells[cell]
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        amount: int,
+        radius_km: float,
+        predicate: Optional[Callable[[TopCandidate], bool]] = None,
+    ) -> list[TopCandidate]:
+        cells = list(self._cells) if math.isinf(radius_km) else grid_cells_within_radius(latitude, longitude, radius_km)
+        orders = [order for cell in cells for order in self._cells.get(cell, {}).values()]
+        if not orders:
+            return []
+
+        latitudes = np.fromiter((o.source_location[0] for o in orders), dtype=float, count=len(orders))
+        longitudes = np.fromiter((o.source_location[1] for o in orders), dtype=float, count=len(orders))
+        in_box = np.flatnonzero(in_bounding_box(latitudes, longitudes, bounding_box(latitude, longitude, radius_km)))
+        distances = haversine_km_to_many(latitude, longitude, latitudes[in_box], longitudes[in_box])
+
+        candidates = []
+        for i in np.argsort(distances, kind="stable"):
+            if distances[i] > radius_km:
+                break
+            candidate = _to_top_candidate(orders[in_box[i]], float(distances[i]))
+            if predicate is None or predicate(candidate):
+                candidates.append(candidate)
+                if len(candidates) == amount:
+                    break
+        return candidates
+
+
+def _to_top_candidate(order: _OpenOrder, distance_from_driver: float) -> TopCandidate:
+    return TopCandidate(
+        distance_from_driver=distance_from_driver,
+        distance=order.trip_distance_km,
+        id=order.id,
+        passengers_amount=order.passengers_amount,
+        source_location=list(order.source_location),
+        estimated_cost=order.estimated_cost,
+        dest_location=list(order.dest_location),
+    )
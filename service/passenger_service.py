@@ -1,46 +1,95 @@
+import math
 import textwrap
+import time
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import text, select, update, delete, and_
+from sqlalchemy import text, select, update, delete, and_, case
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from model.passenger_drive_order import PassengerDriveOrder, PassengerDriveOrderStatus
+from mappings.factory_mapping import is_order_acceptable, limits_to_sql_filter
+from model.passenger_drive_order import (
+    PassengerDriveOrder,
+    PassengerDriveOrderStatus,
+    PASSENGER_DRIVE_ORDER_TABLE,
+    status_is,
+)
+from model.requests.driver import Limit, LimitValues
 from model.top_candidate import TopCandidate
+from service.candidate_search import CandidateSearch
+from service.geo_utils import grid_cell, grid_cells_within_radius, haversine_km, initial_bearing_degrees
+from service.open_orders_index import OpenOrdersIndex
 
-GET_CLOSEST_ORDERS_QUERY = textwrap.dedent(
+# Selects the closest NEW orders matching {search_filter} and the driver's {limits_filter} and freezes them for the driver in a single statement.
+# Rows locked by a concurrent claim are skipped, so two drivers can never freeze the same order.
+CLAIM_CLOSEST_ORDERS_QUERY_TEMPLATE = textwrap.dedent(
     f"""
-
-SELECT
-    6371 * 2 * ASIN(SQRT(
-        POWER(SIN((RADIANS(:latitude) - RADIANS(source_location[1])) / 2), 2) +
-        COS(RADIANS(source_location[1])) * COS(RADIANS(:latitude)) *
-        POWER(SIN((RADIANS(:longitude) - RADIANS(source_location[2] )) / 2), 2)
-    )) AS distance_from_driver, 6371 * 2 * ASIN(SQRT(
-        POWER(SIN((RADIANS(dest_location[1]) - RADIANS(source_location[1])) / 2), 2) +
-        COS(RADIANS(source_location[1])) * COS(RADIANS(dest_location[1])) *
-        POWER(SIN((RADIANS(dest_location[2]) - RADIANS(source_location[2] )) / 2), 2)
-    )) AS distance, id, passengers_amount, source_location, estimated_cost
-FROM
-    passenger_drive_orders
-WHERE
-    status ilike '%NEW%'
-ORDER BY distance_from_driver
-
-LIMIT 10
+UPDATE {PASSENGER_DRIVE_ORDER_TABLE} AS orders
+SET status = :frozen_status, frozen_by = :driver_id
+FROM (
+    SELECT candidate.id, metrics.distance_from_driver, metrics.distance
+    FROM {PASSENGER_DRIVE_ORDER_TABLE} AS candidate
+    CROSS JOIN LATERAL (
+        SELECT
+            6371 * 2 * ASIN(SQRT(
+                POWER(SIN((RADIANS(:latitude) - RADIANS(candidate.source_location[1])) / 2), 2) +
+                COS(RADIANS(candidate.source_location[1])) * COS(RADIANS(:latitude)) *
+                POWER(SIN((RADIANS(:longitude) - RADIANS(candidate.source_location[2])) / 2), 2)
+            )) AS distance_from_driver, candidate.trip_distance_km AS distance
+    ) AS metrics
+    WHERE
+        candidate.status = '{PassengerDriveOrderStatus.NEW.value}' AND {{search_filter}} AND metrics.distance_from_driver <= :radius_km
+        AND {{limits_filter}}
+    ORDER BY metrics.distance_from_driver
+    LIMIT :candidates_limit
+    FOR UPDATE OF candidate SKIP LOCKED
+) AS claimed
+WHERE orders.id = claimed.id
+RETURNING
+    claimed.distance_from_driver, claimed.distance, orders.id, orders.passengers_amount, orders.source_location,
+    orders.estimated_cost, orders.dest_location
 """
 )
+SEARCH_BY_CELLS_FILTER = "candidate.source_cell = ANY(:cells)"
+SEARCH_BY_IDS_FILTER = "candidate.id = ANY(:order_ids)"
 
 
 class PassengerService:
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        open_orders_index: Optional[OpenOrdersIndex] = None,
+        candidate_search: Optional[CandidateSearch] = None,
+    ):
         self._session = session
+        self._open_orders_index = open_orders_index
+        self._candidate_search = candidate_search or CandidateSearch()
+
+    def _index_orders(self, orders: list[PassengerDriveOrder]):
+        if self._open_orders_index is None:
+            return
+        for order in orders:
+            if order.status == PassengerDriveOrderStatus.NEW:
+                self._open_orders_index.add(order)
+            else:
+                self._open_orders_index.remove(order.id)
+
+    def _unindex_orders(self, order_ids: list[int]):
+        if self._open_orders_index is None:
+            return
+        for order_id in order_ids:
+            self._open_orders_index.remove(order_id)
 
     async def save(self, order: PassengerDriveOrder) -> PassengerDriveOrder:
+        source, dest = order.source_location, order.dest_location
+        order.source_cell = grid_cell(source[0], source[1])
+        order.trip_distance_km = haversine_km(source[0], source[1], dest[0], dest[1])
+        order.trip_bearing = initial_bearing_degrees(source[0], source[1], dest[0], dest[1])
         async with self._session.begin_nested():
             self._session.add(order)
 
         await self._session.refresh(order)
+        self._index_orders([order])
 
         return order
 
@@ -78,19 +127,18 @@ class PassengerService:
         )
         return res.scalars().all()
 
-    async def get_by_drive_id_iter(self, drive_id: str) -> list[PassengerDriveOrder]:
+    async def get_open_orders(self) -> list[PassengerDriveOrder]:
         res = await self._session.execute(
-            select(PassengerDriveOrder)
-            .where(PassengerDriveOrder.drive_id == drive_id)
+            select(PassengerDriveOrder).where(status_is(PassengerDriveOrderStatus.NEW))
         )
-        return [a[0] for a in res]
+        return res.scalars().all()
 
     async def cancel_order(self, user_id: str, order_id: int) -> bool:
         await self._session.execute(
             delete(PassengerDriveOrder).where(
                 PassengerDriveOrder.email == user_id,
                 PassengerDriveOrder.id == order_id,
-                PassengerDriveOrder.status == PassengerDriveOrderStatus.NEW,
+                status_is(PassengerDriveOrderStatus.NEW),
             )
         )
         res = (
@@ -98,103 +146,208 @@ class PassengerService:
         ).scalar_one_or_none()
 
         is_delete_success = res is None
+        if is_delete_success:
+            self._unindex_orders([order_id])
         return is_delete_success
 
     async def get_active_by_order_id(self, order_id: int) -> PassengerDriveOrder:
         # async with self._session.begin():
         res = await self._session.execute(
             select(PassengerDriveOrder)
-            .where(PassengerDriveOrder.id == order_id, PassengerDriveOrder.status == PassengerDriveOrderStatus.ACTIVE)
+            .where(PassengerDriveOrder.id == order_id, status_is(PassengerDriveOrderStatus.ACTIVE))
             .limit(1)
         )
         return res.scalar_one_or_none()
 
-    async def set_status_to_drive_order(self, order_id: int, new_status: str):
-        await self._session.execute(
-            update(PassengerDriveOrder).where(PassengerDriveOrder.id == order_id).values(status=new_status)
-        )
-
-    async def set_frozen_by(self, order_id: int, freezer_email: str = None):
-        async with self._session.begin_nested():
-            if freezer_email:
-                # async with self._session.begin():
-                await self._session.execute(
-                    update(PassengerDriveOrder).where((PassengerDriveOrder.id == order_id)).values(frozen_by=freezer_email)
-                )
-
     async def delete(self, drive: PassengerDriveOrder) -> None:
         # async with self._session.begin():
         await self._session.delete(drive)
-
-    async def get_top_order_candidates(self, candidates_amount, current_location: list[float], driver_id: str) -> list[TopCandidate]:
+        self._unindex_orders([drive.id])
+
+    async def get_top_order_candidates(
+        self,
+        current_location: list[float],
+        driver_id: str,
+        limits: Optional[dict[Limit, LimitValues]] = None,
+        candidates_amount: Optional[int] = None,
+    ) -> list[TopCandidate]:
         """
-        1) Get x orders
-        2) Set them frozen
+        Finds the closest NEW orders to the driver which satisfy the driver's limits and freezes them for the driver.
+        The search expands ring by ring (see CandidateSearch), each ring claims up to the missing amount of candidates
+        in one round trip. When the open orders index is enabled, it picks the candidates and the database only
+        claims them.
         """
-
-        # async with self._session.begin():
-        results = await self._session.execute(
-            text(GET_CLOSEST_ORDERS_QUERY), dict(latitude=current_location[0], longitude=current_location[1])
+        limits = limits or {}
+        candidates_amount = candidates_amount or self._candidate_search.pool_size
+        started_at = time.monotonic()
+        rings = self._candidate_search.rings(_get_max_search_radius_km(limits))
+        candidates, rings_searched, budget_exhausted = [], 0, False
+        # Orders an inner ring already tried to claim are not picked again, whether they were claimed or not
+        tried_order_ids: set[int] = set()
+        for radius_km in rings:
+            rings_searched += 1
+            candidates.extend(
+                await self._claim_closest_orders(
+                    current_location,
+                    driver_id,
+                    limits,
+                    radius_km,
+                    candidates_amount - len(candidates),
+                    tried_order_ids,
+                )
+            )
+            if len(candidates) >= candidates_amount:
+                break
+            if rings_searched < len(rings) and self._candidate_search.is_budget_exhausted(started_at):
+                budget_exhausted = True
+                break
+
+        self._candidate_search.record(rings_searched, len(candidates), candidates_amount, budget_exhausted)
+        return sorted(candidates, key=lambda o: o.distance_from_driver)
+
+    async def _claim_closest_orders(
+        self,
+        current_location: list[float],
+        driver_id: str,
+        limits: dict[Limit, LimitValues],
+        radius_km: float,
+        amount: int,
+        tried_order_ids: set[int],
+    ) -> list[TopCandidate]:
+        latitude, longitude = current_location[0], current_location[1]
+        limits_filter, params = limits_to_sql_filter(limits)
+        params.update(
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=radius_km,
+            candidates_limit=amount,
+            driver_id=driver_id,
+            frozen_status=PassengerDriveOrderStatus.FROZEN.value,
         )
-        orders = results.fetchall()
-
-        for order in orders:
-            await self.set_status_to_drive_order(order_id=order.id, new_status=PassengerDriveOrderStatus.FROZEN)
-            await self.set_frozen_by(order_id=order.id, freezer_email=driver_id)
-
-        return orders
 
-    async def release_order_from_freeze(self, email, order_id: int):
-        # async with self._session.begin():
-        await self._session.execute(
-            update(PassengerDriveOrder)
-            .where(
-                PassengerDriveOrder.status == PassengerDriveOrderStatus.FROZEN,
-                PassengerDriveOrder.frozen_by == email,
-                PassengerDriveOrder.id == order_id,
+        if self._open_orders_index is None:
+            if math.isinf(radius_km):
+                search_filter = "TRUE"
+            else:
+                search_filter = SEARCH_BY_CELLS_FILTER
+                params["cells"] = grid_cells_within_radius(latitude, longitude, radius_km)
+        else:
+            if not self._open_orders_index.is_fresh:
+                self._open_orders_index.load(await self.get_open_orders())
+            candidates = self._open_orders_index.nearest(
+                latitude,
+                longitude,
+                amount,
+                radius_km,
+                lambda c: c.id not in tried_order_ids and is_order_acceptable(c, limits),
             )
-            .values(status=PassengerDriveOrderStatus.NEW, frozen_by=None)
+            if not candidates:
+                return []
+            search_filter = SEARCH_BY_IDS_FILTER
+            params["order_ids"] = [c.id for c in candidates]
+            tried_order_ids.update(params["order_ids"])
+
+        res = await self._session.execute(
+            text(CLAIM_CLOSEST_ORDERS_QUERY_TEMPLATE.format(search_filter=search_filter, limits_filter=limits_filter)),
+            params,
         )
+        claimed = res.fetchall()
+        # Only the claimed orders are no longer NEW, candidates skipped because a concurrent claim holds them stay
+        # indexed. If this transaction rolls back, the claimed orders are missing from the index until it is reloaded.
+        self._unindex_orders([o.id for o in claimed])
+        return claimed
 
     async def release_unchosen_orders_from_freeze(self, email, chosen_order_ids: Optional[list[int]] = None):
         if chosen_order_ids:
-            await self._session.execute(
+            res = await self._session.execute(
                 update(PassengerDriveOrder)
                 .where(
                     and_(
-                        PassengerDriveOrder.status == PassengerDriveOrderStatus.FROZEN,
+                        status_is(PassengerDriveOrderStatus.FROZEN),
                         PassengerDriveOrder.frozen_by == email,
                         PassengerDriveOrder.id.notin_(chosen_order_ids),
                     )
                 )
                 .values(status=PassengerDriveOrderStatus.NEW, frozen_by=None)
+                .returning(PassengerDriveOrder)
             )
+            self._index_orders(res.scalars().all())
             return
 
         # async with self._session.begin():
-        await self._session.execute(
+        res = await self._session.execute(
             update(PassengerDriveOrder)
             .where(
-                PassengerDriveOrder.status == PassengerDriveOrderStatus.FROZEN, PassengerDriveOrder.frozen_by == email
+                status_is(PassengerDriveOrderStatus.FROZEN), PassengerDriveOrder.frozen_by == email
             )
             .values(status=PassengerDriveOrderStatus.NEW, frozen_by=None)
+            .returning(PassengerDriveOrder)
         )
+        self._index_orders(res.scalars().all())
 
     async def delete_all_passenger_drive_order(self):
         await self._session.execute(delete(PassengerDriveOrder))
+        if self._open_orders_index is not None:
+            self._open_orders_index.clear()
 
-    async def activate_drive(self, order_id: int, drive_id: str):
-        async with self._session.begin_nested():
-            await self._session.execute(
-                update(PassengerDriveOrder)
-                .where(PassengerDriveOrder.id == order_id)
-                .values(status=PassengerDriveOrderStatus.ACTIVE, drive_id=drive_id)
+    async def lock_frozen_orders(self, driver_id: str, order_ids: list[int]) -> list[int]:
+        """
+        Locks the given orders which are frozen for the driver until the transaction ends, and returns their ids.
+        """
+        res = await self._session.execute(
+            select(PassengerDriveOrder.id)
+            .where(
+                status_is(PassengerDriveOrderStatus.FROZEN),
+                PassengerDriveOrder.frozen_by == driver_id,
+                PassengerDriveOrder.id.in_(order_ids),
             )
+            .with_for_update()
+        )
+        return res.scalars().all()
 
-    async def update_estimated_arrival(self, user_email: str, drive_id: str, est_time: datetime):
-        async with self._session.begin_nested():
-            await self._session.execute(
-                update(PassengerDriveOrder)
-                .where(PassengerDriveOrder.email == user_email, PassengerDriveOrder.drive_id == drive_id)
-                .values(estimated_arrival_time=est_time)
+    async def activate_drive_orders(self, driver_id: str, order_ids: list[int], drive_id: str) -> list[int]:
+        """
+        Activates the given orders which are frozen for the driver, and returns the ids of the activated ones.
+        """
+        res = await self._session.execute(
+            update(PassengerDriveOrder)
+            .where(
+                status_is(PassengerDriveOrderStatus.FROZEN),
+                PassengerDriveOrder.frozen_by == driver_id,
+                PassengerDriveOrder.id.in_(order_ids),
             )
+            .values(status=PassengerDriveOrderStatus.ACTIVE, drive_id=drive_id)
+            .returning(PassengerDriveOrder.id)
+        )
+        activated_ids = res.scalars().all()
+        self._unindex_orders(activated_ids)
+        return activated_ids
+
+    async def finish_drive_orders(self, drive_id: str) -> list[int]:
+        res = await self._session.execute(
+            update(PassengerDriveOrder)
+            .where(PassengerDriveOrder.drive_id == drive_id)
+            .values(status=PassengerDriveOrderStatus.FINISHED)
+            .returning(PassengerDriveOrder.id)
+        )
+        return res.scalars().all()
+
+    async def update_estimated_arrivals(self, drive_id: str, arrivals: dict[str, datetime]):
+        """
+        Sets the estimated arrival time of every passenger (by email) of the drive, in a single UPDATE.
+        """
+        if not arrivals:
+            return
+        await self._session.execute(
+            update(PassengerDriveOrder)
+            .where(PassengerDriveOrder.drive_id == drive_id, PassengerDriveOrder.email.in_(list(arrivals)))
+            .values(estimated_arrival_time=case(arrivals, value=PassengerDriveOrder.email))
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _get_max_search_radius_km(limits: dict[Limit, LimitValues]) -> float:
+    pick_up_limit = limits.get(Limit.pick_up_distance)
+    if pick_up_limit and pick_up_limit.max:
+        return pick_up_limit.max
+    return math.inf
@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime
+
+from model.responses.directions_api import DirectionsApiResponse, DirectionsMatrixResponse
+from model.responses.geocode import Geocode
+from model.top_candidate import TopCandidate
+from service.cost_estimation_service import CostEstimationService
+from service.directions_service import DirectionsService
+from service.route_planner import cheapest_insertion_positions, insert_request, plan_route, route_cost
+from service.time_service import TimeService
+
+
+class ProfitEstimationService:
+    """
+    Estimates what a driver earns from each candidate order: the order's cost minus the cost of its detour.
+    The detour is the driving the order adds to the route of the other candidates, beyond the passenger's own trip.
+    With a single candidate it is the way from the driver to the pick up.
+    """
+
+    def __init__(
+        self,
+        directions_service: DirectionsService,
+        cost_estimation_service: CostEstimationService,
+        time_service: TimeService,
+    ):
+        self._directions_service = directions_service
+        self._cost_estimation_service = cost_estimation_service
+        self._time_service = time_service
+
+    async def estimate_profits(self, driver_location: Geocode, orders: list[TopCandidate]) -> list[float]:
+        if not orders:
+            return []
+
+        # Matrix indexes: 0 is the driver, then every order's pick up location and then the drop locations
+        locations = (
+            [driver_location]
+            + [Geocode(latitude=o.source_location[0], longitude=o.source_location[1]) for o in orders]
+            + [Geocode(latitude=o.dest_location[0], longitude=o.dest_location[1]) for o in orders]
+        )
+        matrix = await self._directions_service.get_matrix(locations, locations)
+        return await asyncio.to_thread(self._estimate_profits, matrix, orders, self._time_service.now())
+
+    def _estimate_profits(
+        self, matrix: DirectionsMatrixResponse, orders: list[TopCandidate], now: datetime
+    ) -> list[float]:
+        requests = [(1 + i, 1 + len(orders) + i) for i in range(len(orders))]
+        route = plan_route(matrix.durations_seconds, requests)
+
+        profits = []
+        for order, request in zip(orders, requests):
+            others_route = [stop for stop in route if stop not in request]
+            added_duration, positions = cheapest_insertion_positions(matrix.durations_seconds, others_route, request)
+            added_distance = route_cost(
+                matrix.distances_meters, insert_request(others_route, request, positions)
+            ) - route_cost(matrix.distances_meters, others_route)
+            own_trip = matrix.get(*request)
+            detour = DirectionsApiResponse(
+                distance_meters=max(added_distance - own_trip.distance_meters, 0),
+                duration_seconds=max(added_duration - own_trip.duration_seconds, 0),
+            )
+            profits.append(order.estimated_cost - self._cost_estimation_service.estimate_cost(now, detour))
+        return profits
@@ -0,0 +1,131 @@
+"""
+Orders the stops of a shared ride. Every passenger has a pick up stop that must come before their drop off stop, and
+the route starts at the driver's location and ends at the last stop. The cost of a route is its total driving
+duration.
+
+The route is built by cheapest insertion and then improved with or-opt (moving a chain of stops) and 2-opt
+(reversing a chain of stops) moves, as long as they keep every pick up before its drop off.
+"""
+from typing import Sequence
+
+Matrix = Sequence[Sequence[float]]
+
+MAX_OR_OPT_CHAIN_LENGTH = 3
+MAX_IMPROVEMENT_ROUNDS = 100
+
+
+def route_cost(durations: Matrix, route: Sequence[int], start: int = 0) -> float:
+    cost = 0.0
+    previous = start
+    for stop in route:
+        cost += durations[previous][stop]
+        previous = stop
+    return cost
+
+
+def _is_feasible(route: Sequence[int], drop_off_pick_ups: dict[int, int]) -> bool:
+    visited = set()
+    for stop in route:
+        pick_up = drop_off_pick_ups.get(stop)
+        if pick_up is not None and pick_up not in visited:
+            return False
+        visited.add(stop)
+    return True
+
+
+def insert_request(route: list[int], request: tuple[int, int], positions: tuple[int, int]) -> list[int]:
+    """
+    Inserts the pick up at positions[0] of the route, and then the drop off at positions[1] of the resulting route.
+    """
+    pick_up, drop_off = request
+    pick_up_position, drop_off_position = positions
+    with_pick_up = route[:pick_up_position] + [pick_up] + route[pick_up_position:]
+    return with_pick_up[:drop_off_position] + [drop_off] + with_pick_up[drop_off_position:]
+
+
+def cheapest_insertion_positions(
+    durations: Matrix, route: Sequence[int], request: tuple[int, int], start: int = 0
+) -> tuple[float, tuple[int, int]]:
+    """
+    Returns the added duration and the positions (see insert_request) of the cheapest insertion of the request.
+    """
+    pick_up, drop_off = request
+    stops = [start] + list(route)
+    best = None
+    for i in range(len(stops)):
+        # Cost of visiting the pick up right after stops[i]
+        after_pick_up = stops[i + 1] if i + 1 < len(stops) else None
+        for j in range(i, len(stops)):
+            after_drop_off = stops[j + 1] if j + 1 < len(stops) else None
+            if i == j:
+                added = durations[stops[i]][pick_up] + durations[pick_up][drop_off]
+                if after_pick_up is not None:
+                    added += durations[drop_off][after_pick_up] - durations[stops[i]][after_pick_up]
+            else:
+                added = durations[stops[i]][pick_up] + durations[pick_up][after_pick_up]
+                added -= durations[stops[i]][after_pick_up]
+                added += durations[stops[j]][drop_off]
+                if after_drop_off is not None:
+                    added += durations[drop_off][after_drop_off] - durations[stops[j]][after_drop_off]
+            if best is None or added < best[0]:
+                best = (added, (i, j + 1))
+    return best
+
+
+def _cheapest_insertion(durations: Matrix, requests: list[tuple[int, int]], start: int) -> list[int]:
+    route: list[int] = []
+    remaining = list(requests)
+    while remaining:
+        best = min(
+            ((*cheapest_insertion_positions(durations, route, request, start), request) for request in remaining),
+            key=lambda insertion: insertion[0],
+        )
+        _, positions, request = best
+        route = insert_request(route, request, positions)
+        remaining.remove(request)
+    return route
+
+
+def _or_opt_moves(route: list[int]):
+    for length in range(1, min(MAX_OR_OPT_CHAIN_LENGTH, len(route) - 1) + 1):
+        for i in range(len(route) - length + 1):
+            chain = route[i : i + length]
+            rest = route[:i] + route[i + length :]
+            for j in range(len(rest) + 1):
+                if j != i:
+                    yield rest[:j] + chain + rest[j:]
+
+
+def _two_opt_moves(route: list[int]):
+    for i in range(len(route) - 1):
+        for j in range(i + 2, len(route) + 1):
+            yield route[:i] + route[i:j][::-1] + route[j:]
+
+
+def _improve(durations: Matrix, route: list[int], drop_off_pick_ups: dict[int, int], start: int) -> list[int]:
+    best_cost = route_cost(durations, route, start)
+    for _ in range(MAX_IMPROVEMENT_ROUNDS):
+        improved = False
+        for move in (_or_opt_moves, _two_opt_moves):
+            for candidate in move(route):
+                cost = route_cost(durations, candidate, start)
+                if cost < best_cost - 1e-9 and _is_feasible(candidate, drop_off_pick_ups):
+                    route, best_cost, improved = candidate, cost, True
+                    break
+        if not improved:
+            break
+    return route
+
+
+def plan_route(durations: Matrix, requests: Sequence[tuple[int, int]], start: int = 0) -> list[int]:
+    """
+    Returns the stops in the order they should be visited.
+
+    :param durations: durations[i][j] is the driving duration from location i to location j
+    :param requests: (pick up, drop off) location indexes of every passenger
+    :param start: location index of the driver
+    """
+    requests = list(requests)
+    drop_off_pick_ups = {drop_off: pick_up for pick_up, drop_off in requests}
+    route = _cheapest_insertion(durations, requests, start)
+    return _improve(durations, route, drop_off_pick_ups, start)
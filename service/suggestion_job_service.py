@@ -0,0 +1,107 @@
+import asyncio
+from http import HTTPStatus
+from typing import Awaitable, Callable, Hashable, Optional
+from uuid import uuid4
+
+from fastapi import HTTPException
+
+from logger import logger
+from model.responses.driver import SuggestionJobStatus
+from model.responses.knapsack import SuggestedSolution
+from service.ttl_cache import TtlCache
+
+
+class SuggestionJob:
+    def __init__(self, job_id: str, driver_id: str, request_key: Hashable):
+        self.id = job_id
+        self.driver_id = driver_id
+        self.request_key = request_key
+        self.status = SuggestionJobStatus.PENDING
+        self.result: Optional[SuggestedSolution] = None
+        self.error: Optional[str] = None
+        self._done = asyncio.Event()
+
+    @property
+    def is_done(self) -> bool:
+        return self._done.is_set()
+
+    def finish(self, result: SuggestedSolution):
+        self.status = SuggestionJobStatus.DONE
+        self.result = result
+        self._done.set()
+
+    def fail(self, error: str):
+        self.status = SuggestionJobStatus.FAILED
+        self.error = error
+        self._done.set()
+
+    async def wait(self, timeout_seconds: float) -> bool:
+        """
+        Returns whether the job is done, waiting up to the given timeout for it.
+        """
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout_seconds)
+        except asyncio.TimeoutError:
+            pass
+        return self.is_done
+
+
+class SuggestionJobService:
+    """
+    Runs drive suggestion computations in the background, so the request that submitted them does not hold a worker
+    and a database transaction while the knapsack backend solves. Jobs live in this process only, so clients must
+    poll the worker that accepted the job, and they are forgotten once the TTL passes.
+    A driver has at most one pending job: submitting the same request again while it runs returns the same job, and
+    submitting a different one is rejected.
+    """
+
+    def __init__(self, ttl_seconds: float, max_jobs: int = 10000):
+        self._jobs = TtlCache(max_jobs, ttl_seconds)
+        self._pending_by_driver: dict[str, SuggestionJob] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def __len__(self):
+        return len(self._pending_by_driver)
+
+    def submit(
+        self, driver_id: str, request_key: Hashable, compute: Callable[[], Awaitable[SuggestedSolution]]
+    ) -> SuggestionJob:
+        job = self._pending_by_driver.get(driver_id)
+        if job is not None:
+            if job.request_key != request_key:
+                raise HTTPException(
+                    status_code=HTTPStatus.CONFLICT, detail="Another suggestion job of the driver is still running"
+                )
+            return job
+
+        job = SuggestionJob(str(uuid4()), driver_id, request_key)
+        self._jobs.set(job.id, job)
+        self._pending_by_driver[driver_id] = job
+        task = asyncio.create_task(self._run(job, compute))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, driver_id: str, job_id: str) -> Optional[SuggestionJob]:
+        job = self._jobs.get(job_id)
+        if job is None or job.driver_id != driver_id:
+            return None
+        return job
+
+    async def _run(self, job: SuggestionJob, compute: Callable[[], Awaitable[SuggestedSolution]]):
+        try:
+            job.finish(await compute())
+        except HTTPException as e:
+            job.fail(str(e.detail))
+        except Exception as e:
+            logger.exception(f"Suggestion job {job.id} failed: {e}")
+            job.fail("Failed computing drive suggestions")
+        finally:
+            self._pending_by_driver.pop(job.driver_id, None)
+            # The finished job is kept for a whole TTL from now, not from its submission
+            self._jobs.set(job.id, job)
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -1,3 +1,4 @@
+import asyncio
 from http import HTTPStatus
 from typing import Optional
 
@@ -6,11 +7,20 @@ from httpx import AsyncClient
 
 from model.requests.user import UserHandlerLoginRequest, UserHandlerCreateUserRequest, UserHandlerUpdateUserRequest
 from model.responses.user import UserHandlerResponse, UserHandlerGetByEmailResponse
+from service.single_flight import SingleFlight
+from service.ttl_cache import TtlCache
 
 
 class UserHandlerService:
-    def __init__(self, http_client: AsyncClient):
+    def __init__(
+        self,
+        http_client: AsyncClient,
+        single_flight: Optional[SingleFlight] = None,
+        profile_cache: Optional[TtlCache[UserHandlerGetByEmailResponse]] = None,
+    ):
         self._client: AsyncClient = http_client
+        self._single_flight = single_flight
+        self._profile_cache = profile_cache
 
     async def login(self, username: str, password: str) -> Optional[dict]:
         request = UserHandlerLoginRequest(username=username, password=password)
@@ -35,6 +45,30 @@ class UserHandlerService:
         return UserHandlerResponse(**response.json())
 
     async def get_user_by_email(self, email: str, token: str) -> UserHandlerGetByEmailResponse:
+        """
+        Concurrent lookups of the same user share one call. Every route authenticates its caller before looking
+        users up, so the lookup does not depend on whose token is used.
+        """
+        if self._profile_cache is not None and (user := self._profile_cache.get(email)) is not None:
+            return user
+
+        if self._single_flight is None:
+            user = await self._get_user_by_email(email, token)
+        else:
+            user = await self._single_flight.do(email, lambda: self._get_user_by_email(email, token))
+        if self._profile_cache is not None and user.result is not None:
+            self._profile_cache.set(email, user)
+        return user
+
+    async def get_users_by_email(self, emails: list[str], token: str) -> dict[str, UserHandlerGetByEmailResponse]:
+        """
+        Looks up all the users concurrently, each user once.
+        """
+        unique_emails = list(dict.fromkeys(emails))
+        users = await asyncio.gather(*(self.get_user_by_email(email, token) for email in unique_emails))
+        return dict(zip(unique_emails, users))
+
+    async def _get_user_by_email(self, email: str, token: str) -> UserHandlerGetByEmailResponse:
         response = await self._client.get(f"/users/{email}", headers={"Authorization": f"Bearer {token}"})
         response.raise_for_status()
 
@@ -57,12 +91,14 @@ class UserHandlerService:
             f"/users/{email}", json={"parameter": request.dict()}, headers={"Authorization": f"Bearer {token}"}
         )
         response.raise_for_status()
+        self._forget_profile(email)
 
         return UserHandlerResponse(**response.json())
 
     async def delete_user(self, email: str, token: str) -> UserHandlerResponse:
         response = await self._client.delete(f"/users/{email}", headers={"Authorization": f"Bearer {token}"})
         response.raise_for_status()
+        self._forget_profile(email)
 
         return UserHandlerResponse(**response.json())
 
@@ -91,3 +127,7 @@ class UserHandlerService:
         response.raise_for_status()
 
         return UserHandlerResponse(**response.json())
+
+    def _forget_profile(self, email: str):
+        if self._profile_cache is not None:
+            self._profile_cache.pop(email)
@@ -1,5 +1,5 @@
-from mappings.factory_mapping import LIMITS_MAPPING
-from mappings.utils import limit_by_range
+from mappings.factory_mapping import LIMITS_MAPPING, is_order_acceptable, limits_to_sql_filter
+from mappings.utils import limit_by_range, limit_by_range_sql
 from model.requests.driver import LimitValues, Limit
 
 
@@ -77,3 +77,38 @@ def test_limit_mapping():
         )
         is False
     )
+
+
+def test_limit_by_range_sql():
+    assert limit_by_range_sql("x", LimitValues(min=1, max=6), "p") == (
+        ["x >= :p_min", "x <= :p_max"],
+        {"p_min": 1, "p_max": 6},
+    )
+    assert limit_by_range_sql("x", LimitValues(max=6), "p") == (["x <= :p_max"], {"p_max": 6})
+    assert limit_by_range_sql("x", LimitValues(), "p") == ([], {})
+
+
+def test_limits_to_sql_filter():
+    assert limits_to_sql_filter({}) == ("TRUE", {})
+
+    sql_filter, params = limits_to_sql_filter(
+        {Limit.pick_up_distance: LimitValues(max=3), Limit.ride_distance: LimitValues(min=1, max=20)}
+    )
+    assert sql_filter == (
+        "metrics.distance_from_driver <= :limit_pick_up_distance_max"
+        " AND metrics.distance >= :limit_ride_distance_min"
+        " AND metrics.distance <= :limit_ride_distance_max"
+    )
+    assert params == {"limit_pick_up_distance_max": 3, "limit_ride_distance_min": 1, "limit_ride_distance_max": 20}
+
+
+def test_is_order_acceptable():
+    class Order:
+        distance_from_driver = 2
+        distance = 10
+
+    assert is_order_acceptable(Order(), {})
+    assert is_order_acceptable(Order(), {Limit.pick_up_distance: LimitValues(max=3)})
+    assert not is_order_acceptable(
+        Order(), {Limit.pick_up_distance: LimitValues(max=3), Limit.ride_distance: LimitValues(max=5)}
+    )
@@ -1,4 +1,5 @@
 import datetime
+import json
 import time
 from datetime import timedelta
 from http import HTTPStatus
@@ -17,10 +18,10 @@ from component_factory import (
 from controllers import driver
 from controllers.utils import authenticated_user
 from model.passenger_drive_order import PassengerDriveOrderStatus
-from model.requests.driver import DriverRequestDrive, DriverAcceptDrive
+from model.requests.driver import DriverRequestDrive, DriverAcceptDrive, Limit
 from model.requests.knapsack import KnapsackItem
 from model.requests.passenger import PassengerDriveOrderRequest, DriveOrderRequestParam
-from model.responses.driver import DriveDetails, OrderLocation
+from model.responses.driver import DriveDetails, OrderLocation, SuggestionJobResponse
 from model.responses.geocode import Geocode
 from model.responses.knapsack import SuggestedSolution, KnapsackSolution
 from model.responses.passenger import DriveOrderResponse
@@ -153,6 +154,22 @@ async def test_accept_drive_non_existing_order_id(test_client: TestClient, clear
     )
 
 
+async def test_accept_drive_orders_released(test_client: TestClient, request_drive: tuple[str, KnapsackSolution]):
+    drive_id, _ = request_drive
+    driver_email = app.dependency_overrides[authenticated_user]().email
+    async with get_db_session_maker(create_db_engine(get_database_url(get_config())))() as session:
+        async with session.begin():
+            await get_passenger_service(session).release_unchosen_orders_from_freeze(driver_email)
+
+    resp = await test_client.post(
+        url="/driver/accept-drive", req_body=DriverAcceptDrive(order_id=drive_id), resp_model=SuccessResponse
+    )
+
+    assert not resp.success
+    drive_details = await test_client.get(url=f"/driver/drive-details/{drive_id}", assert_status=None)
+    assert drive_details.status_code == HTTPStatus.NOT_ACCEPTABLE
+
+
 async def test_reject_drive(test_client: TestClient, clear_orders_tables, passenger_service):
 
     passenger_order: DriveOrderResponse = await add_new_passenger_drive_order(test_client)
@@ -244,6 +261,24 @@ async def test_request_drives_suggestion_already_exists(test_client):
     assert first_resp == second_resp
 
 
+async def test_request_drives_async_with_limits(test_client, clear_orders_tables):
+    # The limits are keyed by the Limit enum, which the request model cannot serialize, so the body is sent as is
+    request_drive_request = {
+        "currentLat": random_latitude(),
+        "currentLon": random_longitude(),
+        "limits": {Limit.pick_up_distance.value: {"max": 30}, Limit.ride_distance.value: {"min": 1}},
+    }
+    job: SuggestionJobResponse = await test_client.post(
+        url="/driver/request-drives-async",
+        content=json.dumps(request_drive_request),
+        headers={"Content-Type": "application/json"},
+        resp_model=SuggestionJobResponse,
+    )
+
+    polled_job = await test_client.get(url=f"/driver/suggestion-jobs/{job.job_id}", resp_model=SuggestionJobResponse)
+    assert polled_job.job_id == job.job_id
+
+
 @pytest.fixture
 def mock_time_service() -> TimeService:
     time_service: TimeService = MagicMock()
@@ -0,0 +1,90 @@
+import base64
+import hashlib
+import hmac
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from model.responses.user import UserHandlerResponse
+from service.auth_service import AuthService, decode_signed_token
+from service.time_service import TimeService
+from service.ttl_cache import TtlCache
+
+pytestmark = pytest.mark.asyncio
+
+SIGNING_KEY = "secret"
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _signed_token(claims: dict, key: str = SIGNING_KEY) -> str:
+    signing_input = (
+        f"{_b64encode(json.dumps({'alg': 'HS256', 'typ': 'JWT'}).encode())}.{_b64encode(json.dumps(claims).encode())}"
+    )
+    signature = hmac.new(key.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{_b64encode(signature)}"
+
+
+def _user_handler_service(claims: dict) -> MagicMock:
+    return MagicMock(
+        validate_token=AsyncMock(return_value=UserHandlerResponse(code=200, result={"is_valid": True, "token": claims}))
+    )
+
+
+def _expiry(seconds: float) -> float:
+    return TimeService().now().timestamp() + seconds
+
+
+async def test_decode_signed_token():
+    claims = {"email": "a@b.com", "exp": 1}
+    assert decode_signed_token(_signed_token(claims), SIGNING_KEY) == claims
+    assert decode_signed_token(_signed_token(claims, "other"), SIGNING_KEY) is None
+    assert decode_signed_token("not a token", SIGNING_KEY) is None
+
+
+async def test_validated_token_cached():
+    claims = {"email": "a@b.com", "exp": _expiry(60)}
+    user_handler_service = _user_handler_service(claims)
+    service = AuthService(user_handler_service, TimeService(), cache=TtlCache(10, 30), max_cache_seconds=30)
+
+    assert await service.authenticate("token") == claims
+    assert await service.authenticate("token") == claims
+    user_handler_service.validate_token.assert_awaited_once()
+
+
+async def test_expired_token_not_cached():
+    claims = {"email": "a@b.com", "exp": _expiry(-1)}
+    user_handler_service = _user_handler_service(claims)
+    service = AuthService(user_handler_service, TimeService(), cache=TtlCache(10, 30), max_cache_seconds=30)
+
+    await service.authenticate("token")
+    await service.authenticate("token")
+    assert user_handler_service.validate_token.await_count == 2
+
+
+async def test_signed_token_verified_locally():
+    user_handler_service = _user_handler_service({"email": "a@b.com"})
+    service = AuthService(user_handler_service, TimeService(), signing_key=SIGNING_KEY)
+    claims = {"email": "c@d.com", "exp": _expiry(60)}
+
+    assert await service.authenticate(_signed_token(claims)) == claims
+    with pytest.raises(HTTPException):
+        await service.authenticate(_signed_token({"email": "c@d.com", "exp": _expiry(-1)}))
+    user_handler_service.validate_token.assert_not_awaited()
+
+    assert await service.authenticate(_signed_token(claims, "other")) == {"email": "a@b.com"}
+    user_handler_service.validate_token.assert_awaited_once()
+
+
+async def test_signed_token_without_expiry_validated_by_backend():
+    user_handler_service = _user_handler_service({"email": "c@d.com"})
+    cache = TtlCache(10, 60)
+    service = AuthService(user_handler_service, TimeService(), cache, max_cache_seconds=30, signing_key=SIGNING_KEY)
+
+    assert await service.authenticate(_signed_token({"email": "c@d.com"})) == {"email": "c@d.com"}
+    user_handler_service.validate_token.assert_awaited_once()
+    assert len(cache) == 1
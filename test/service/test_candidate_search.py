@@ -0,0 +1,29 @@
+import math
+
+from service.candidate_search import CandidateSearch
+
+
+def test_rings_capped_by_max_radius():
+    search = CandidateSearch(rings_km=(3, 1, 10))
+
+    assert search.rings(math.inf) == [1, 3, 10, math.inf]
+    assert search.rings(10) == [1, 3, 10]
+    assert search.rings(5) == [1, 3, 5]
+    assert search.rings(3) == [1, 3]
+    assert search.rings(0.5) == [0.5]
+
+
+def test_budget():
+    assert CandidateSearch(budget_seconds=0).is_budget_exhausted(0)
+    assert not CandidateSearch(budget_seconds=math.inf).is_budget_exhausted(0)
+
+
+def test_metrics():
+    search = CandidateSearch(pool_size=2)
+    search.record(rings_searched=1, candidates=2, pool_size=2, budget_exhausted=False)
+    search.record(rings_searched=3, candidates=0, pool_size=2, budget_exhausted=True)
+
+    assert search.average_rings == 2
+    assert search.average_candidates == 1
+    assert search.full_pools == 1
+    assert search.exhausted_budgets == 1
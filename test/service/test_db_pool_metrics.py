@@ -0,0 +1,36 @@
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.util import greenlet_spawn
+
+from service.db_pool_metrics import InstrumentedAsyncAdaptedQueuePool, PoolMetrics
+
+
+def test_pool_metrics():
+    metrics = PoolMetrics()
+    assert metrics.average_wait_seconds == 0
+
+    metrics.record_checkout(0.1)
+    metrics.record_checkout(0.3)
+    metrics.record_timeout()
+
+    assert metrics.checkouts == 2
+    assert metrics.timeouts == 1
+    assert metrics.average_wait_seconds == pytest.approx(0.2)
+    assert metrics.max_wait_seconds == pytest.approx(0.3)
+
+
+@pytest.mark.asyncio
+async def test_pool_records_checkout_and_keeps_metrics_on_recreate():
+    pool = InstrumentedAsyncAdaptedQueuePool(MagicMock(), pool_size=1, max_overflow=0, timeout=0.01)
+
+    connection = await greenlet_spawn(pool.connect)
+    assert pool.metrics.checkouts == 1
+
+    with pytest.raises(PoolTimeoutError):
+        await greenlet_spawn(pool.connect)
+    assert pool.metrics.timeouts == 1
+
+    await greenlet_spawn(connection.close)
+    assert pool.recreate().metrics is pool.metrics
@@ -1,8 +1,16 @@
+import asyncio
+from unittest.mock import MagicMock, AsyncMock
+
 import pytest
+from httpx import Response
 
 from component_factory import get_directions_service, get_config
 from logger import logger
+from model.responses.directions_api import DirectionsApiResponse
 from model.responses.geocode import Geocode
+from service.directions_service import DirectionsService
+from service.single_flight import SingleFlight
+from service.ttl_cache import TtlCache
 
 
 @pytest.mark.skip("This test using the actual directions api. Do not skip if there is an issue there")
@@ -14,3 +22,89 @@ async def test_directions_api():
     logger.info(f"Duration seconds: {resp.duration_seconds}. Distance meters: {resp.distance_meters}")
     assert resp.duration_seconds > 0
     assert resp.distance_meters > 0
+
+
+@pytest.mark.asyncio
+async def test_get_directions_cached_by_rounded_coordinates():
+    svc = DirectionsService("/directions", http_client=MagicMock(), cache=TtlCache(10, 30), cache_precision=3)
+    svc._fetch_directions = AsyncMock(return_value=DirectionsApiResponse(duration_seconds=60, distance_meters=500))
+    destination = Geocode(latitude=32.080134, longitude=34.791873)
+
+    first = await svc.get_directions(Geocode(latitude=32.078039, longitude=34.806845), destination)
+    second = await svc.get_directions(Geocode(latitude=32.078041, longitude=34.806848), destination)
+    await svc.get_directions(Geocode(latitude=32.1, longitude=34.806845), destination)
+
+    assert first == second
+    assert svc._fetch_directions.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_get_directions_stored():
+    stored = DirectionsApiResponse(duration_seconds=60, distance_meters=500)
+    store = MagicMock(get=AsyncMock(side_effect=[stored, None]))
+    svc = DirectionsService("/directions", http_client=MagicMock(), store=store)
+    fetched = DirectionsApiResponse(duration_seconds=120, distance_meters=900)
+    svc._fetch_directions = AsyncMock(return_value=fetched)
+    source, destination = Geocode(latitude=32.078039, longitude=34.806845), Geocode(
+        latitude=32.080134, longitude=34.791873
+    )
+
+    assert await svc.get_directions(source, destination) == stored
+    assert await svc.get_directions(source, destination) == fetched
+    svc._fetch_directions.assert_awaited_once()
+    store.put.assert_called_once_with(source, destination, fetched)
+
+
+@pytest.mark.asyncio
+async def test_get_matrix():
+    client = MagicMock(
+        post=AsyncMock(return_value=Response(200, json={"durations": [[60, 120]], "distances": [[500, 900]]}))
+    )
+    svc = DirectionsService("/ors/v2/directions/driving-car", http_client=client, cache=TtlCache(10, 30))
+    source = Geocode(latitude=32.078039, longitude=34.806845)
+    destinations = [Geocode(latitude=32.080134, longitude=34.791873), Geocode(latitude=32.09, longitude=34.8)]
+
+    matrix = await svc.get_matrix([source], destinations)
+    cached = await svc.get_matrix([source], destinations)
+
+    assert matrix.get(0, 1) == DirectionsApiResponse(duration_seconds=120, distance_meters=900)
+    assert cached == matrix
+    assert await svc.get_directions(source, destinations[0]) == matrix.get(0, 0)
+    client.post.assert_awaited_once()
+    assert client.post.await_args.args[0] == "/ors/v2/matrix/driving-car"
+    assert client.post.await_args.kwargs["json"]["destinations"] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_get_matrix_fetches_only_missing_legs():
+    client = MagicMock(post=AsyncMock(return_value=Response(200, json={"durations": [[120]], "distances": [[900]]})))
+    stored = DirectionsApiResponse(duration_seconds=60, distance_meters=500)
+    store = MagicMock(get_many=AsyncMock(return_value=[stored, None]))
+    svc = DirectionsService("/ors/v2/directions/driving-car", http_client=client, store=store)
+    source = Geocode(latitude=32.078039, longitude=34.806845)
+    destinations = [Geocode(latitude=32.080134, longitude=34.791873), Geocode(latitude=32.09, longitude=34.8)]
+
+    matrix = await svc.get_matrix([source], destinations)
+
+    assert matrix.get(0, 0) == stored
+    assert matrix.get(0, 1) == DirectionsApiResponse(duration_seconds=120, distance_meters=900)
+    assert client.post.await_args.kwargs["json"]["locations"] == [[34.806845, 32.078039], [34.8, 32.09]]
+    store.put_many.assert_called_once_with([(source, destinations[1], matrix.get(0, 1))])
+
+
+@pytest.mark.asyncio
+async def test_identical_matrix_calls_coalesced():
+    async def post(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        return Response(200, json={"durations": [[120]], "distances": [[900]]})
+
+    client = MagicMock(post=AsyncMock(side_effect=post))
+    svc = DirectionsService("/ors/v2/directions/driving-car", http_client=client, single_flight=SingleFlight())
+    source, destination = Geocode(latitude=32.078039, longitude=34.806845), Geocode(latitude=32.09, longitude=34.8)
+
+    first, second = await asyncio.gather(
+        svc.get_matrix([source], [destination]), svc.get_matrix([source], [destination])
+    )
+
+    assert first == second
+    client.post.assert_awaited_once()
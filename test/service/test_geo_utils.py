@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from service.geo_utils import (
+    grid_cell,
+    grid_cells_within_radius,
+    quantized_cell,
+    haversine_km_to_many,
+    haversine_km_matrix,
+    bounding_box,
+    in_bounding_box,
+    haversine_km,
+    initial_bearing_degrees,
+    GRID_CELL_DEGREES,
+)
+
+
+def test_haversine_km():
+    assert haversine_km(32.078039, 34.806845, 32.078039, 34.806845) == 0
+    assert haversine_km(32.078039, 34.806845, 32.080134, 34.791873) == pytest.approx(1.43, abs=0.01)
+
+
+def test_initial_bearing_degrees():
+    assert initial_bearing_degrees(32, 34, 33, 34) == pytest.approx(0)
+    assert initial_bearing_degrees(32, 34, 32, 35) == pytest.approx(89.73, abs=0.01)
+    assert initial_bearing_degrees(32, 34, 31, 34) == pytest.approx(180)
+    assert initial_bearing_degrees(32, 34, 32, 33) == pytest.approx(270.27, abs=0.01)
+
+
+def test_grid_cell_neighbours_are_distinct():
+    latitude, longitude = 32.071, 34.801
+    cell = grid_cell(latitude, longitude)
+    assert grid_cell(latitude + GRID_CELL_DEGREES, longitude) != cell
+    assert grid_cell(latitude, longitude + GRID_CELL_DEGREES) != cell
+    assert grid_cell(latitude + GRID_CELL_DEGREES / 4, longitude + GRID_CELL_DEGREES / 4) == cell
+
+
+@pytest.mark.parametrize("radius_km", [0.5, 3, 10])
+def test_grid_cells_within_radius_cover_points_in_radius(radius_km):
+    latitude, longitude = 32.078039, 34.806845
+    cells = set(grid_cells_within_radius(latitude, longitude, radius_km))
+    offset = radius_km / 111.32 * 0.99
+    for lat, lon in [
+        (latitude, longitude),
+        (latitude + offset, longitude),
+        (latitude - offset, longitude),
+        (latitude, longitude + offset),
+        (latitude, longitude - offset),
+    ]:
+        assert haversine_km(latitude, longitude, lat, lon) <= radius_km
+        assert grid_cell(lat, lon) in cells
+
+
+def test_quantized_cell():
+    assert quantized_cell(32.07804, 34.80685, 4) == quantized_cell(32.078039, 34.806845, 4)
+    assert quantized_cell(32.0781, 34.80685, 4) != quantized_cell(32.078039, 34.806845, 4)
+    assert quantized_cell(32.078039, -34.806845, 4) != quantized_cell(32.078039, 34.806845, 4)
+
+
+def test_haversine_km_to_many():
+    latitudes, longitudes = np.array([32.080134, 32.2, 32.078039]), np.array([34.791873, 34.9, 34.806845])
+
+    distances = haversine_km_to_many(32.078039, 34.806845, latitudes, longitudes)
+
+    expected = [haversine_km(32.078039, 34.806845, lat, lon) for lat, lon in zip(latitudes, longitudes)]
+    assert distances == pytest.approx(expected)
+    assert distances[2] == 0
+
+
+def test_haversine_km_matrix():
+    latitudes, longitudes = np.array([32.08, 32.2]), np.array([34.79, 34.9])
+
+    distances = haversine_km_matrix(latitudes[:1], longitudes[:1], latitudes, longitudes)
+
+    assert distances.shape == (1, 2)
+    assert distances[0, 1] == pytest.approx(haversine_km(32.08, 34.79, 32.2, 34.9))
+
+
+def test_bounding_box_prefilter():
+    latitudes, longitudes = np.array([32.08, 32.2, 32.08]), np.array([34.8, 34.8, 34.9])
+    box = bounding_box(32.078039, 34.806845, 5)
+
+    assert list(in_bounding_box(latitudes, longitudes, box)) == [True, False, False]
+    assert haversine_km(32.078039, 34.806845, box[2], 34.806845) == pytest.approx(5, rel=0.01)
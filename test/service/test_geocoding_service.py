@@ -1,3 +1,4 @@
+import asyncio
 import json
 from unittest.mock import AsyncMock, MagicMock
 
@@ -5,7 +6,9 @@ import pytest
 from httpx import AsyncClient
 
 from model.position import Position
-from service.geocoding_service import GeocodingService
+from service.geocoding_service import GeocodingService, canonical_address
+from service.single_flight import SingleFlight
+from service.ttl_cache import TtlCache
 
 pytestmark = pytest.mark.asyncio
 
@@ -32,3 +35,54 @@ async def test_geocoding_service():
     expected_position = Position(lat=resp["items"][0]["position"]["lat"], lon=resp["items"][0]["position"]["lng"])
     assert res.position == expected_position
     assert not res.is_single_result
+
+
+async def test_concurrent_geocoding_coalesced():
+    client = AsyncMock(AsyncClient)
+    with open("test/resources/geocoding-response.json", mode="r") as f:
+        resp = json.load(f)
+    resp_mock = AsyncMock()
+    resp_mock.raise_for_status = MagicMock()
+    resp_mock.json = MagicMock(return_value=resp)
+
+    async def _get(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        return resp_mock
+
+    client.get = AsyncMock(side_effect=_get)
+    service = GeocodingService(client, "mock", SingleFlight())
+
+    results = await asyncio.gather(service.geocode_address("Maiden lane 75"), service.geocode_address("Maiden+lane+75"))
+
+    assert results[0] == results[1]
+    client.get.assert_awaited_once()
+
+
+@pytest.mark.parametrize(
+    "address",
+    [
+        "Maiden lane 75, New York",
+        "maiden  lane 75 new-york",
+        "Maiden+Lane+75%2C+New+York",
+        " MAIDEN LANE 75. NEW YORK ",
+    ],
+)
+def test_canonical_address(address):
+    assert canonical_address(address) == "maiden lane 75 new york"
+
+
+async def test_geocoding_cached():
+    client = AsyncMock(AsyncClient)
+    with open("test/resources/geocoding-response.json", mode="r") as f:
+        resp = json.load(f)
+    resp_mock = AsyncMock()
+    resp_mock.raise_for_status = MagicMock()
+    resp_mock.json = MagicMock(return_value=resp)
+    client.get = AsyncMock(return_value=resp_mock)
+    service = GeocodingService(client, "mock", cache=TtlCache(10, 30))
+
+    first = await service.geocode_address("Maiden lane 75, New York")
+    second = await service.geocode_address("maiden lane 75 new york")
+
+    assert first == second
+    client.get.assert_awaited_once()
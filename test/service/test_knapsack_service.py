@@ -118,3 +118,59 @@ async def test_is_item_claimed(is_claimed):
 
     is_claimed_response = await service.is_ride_request_claimed(get_random_string())
     assert is_claimed_response == is_claimed
+
+
+async def test_suggest_solution_solved_locally():
+    client = AsyncMock(AsyncClient)
+    service = KnapsackService(client, TimeService(), local_max_items=3, local_solutions_amount=2)
+    items = [
+        KnapsackItem(id="a", value=5, volume=2),
+        KnapsackItem(id="b", value=4, volume=2),
+        KnapsackItem(id="c", value=3, volume=1),
+    ]
+
+    suggestion = await service.suggest_solution(get_random_email(), 3, items)
+
+    client.post.assert_not_called()
+    assert suggestion.expires_at > suggestion.time
+    solutions = sorted(suggestion.solutions.values(), key=lambda s: s.total_value, reverse=True)
+    assert [sorted(i.id for i in s.items) for s in solutions] == [["a", "c"], ["b", "c"]]
+    assert all(s.total_volume <= 3 for s in solutions)
+
+
+async def test_suggest_solution_too_big_for_local_solver():
+    client = AsyncMock(AsyncClient)
+    service = KnapsackService(client, TimeService(), local_max_items=1)
+    items = [KnapsackItem(id=get_random_string(), value=1, volume=1) for _ in range(2)]
+    client.post = AsyncMock(
+        return_value=_get_response(
+            SuggestedSolution(time=datetime.now(), solutions={}, expires_at=datetime.now()).json()
+        )
+    )
+
+    await service.suggest_solution(get_random_email(), 3, items)
+
+    client.post.assert_called_once()
+
+
+async def test_accept_local_solution():
+    client = AsyncMock(AsyncClient)
+    service = KnapsackService(client, TimeService(), local_max_items=3)
+    suggestion = await service.suggest_solution(get_random_email(), 3, [KnapsackItem(id="a", value=1, volume=1)])
+
+    assert await service.accept_solution(get_random_email(), next(iter(suggestion.solutions)))
+    client.post.assert_not_called()
+
+
+async def test_local_solver_disabled():
+    client = AsyncMock(AsyncClient)
+    service = KnapsackService(client, TimeService(), local_max_items=0)
+    client.post = AsyncMock(
+        return_value=_get_response(
+            SuggestedSolution(time=datetime.now(), solutions={}, expires_at=datetime.now()).json()
+        )
+    )
+
+    await service.suggest_solution(get_random_email(), 3, [])
+
+    client.post.assert_called_once()
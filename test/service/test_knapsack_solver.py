@@ -0,0 +1,45 @@
+import itertools
+import random
+
+from model.requests.knapsack import KnapsackItem
+from service.knapsack_solver import solve_top_k
+
+
+def _value(solution: list[KnapsackItem]) -> int:
+    return sum(item.value for item in solution)
+
+
+def test_best_solution():
+    items = [
+        KnapsackItem(id="a", value=10, volume=3),
+        KnapsackItem(id="b", value=6, volume=2),
+        KnapsackItem(id="c", value=6, volume=2),
+        KnapsackItem(id="d", value=100, volume=5),
+    ]
+
+    solutions = solve_top_k(items, capacity=4, k=3)
+
+    assert [{i.id for i in s} for s in solutions] == [{"b", "c"}, {"a"}, {"b"}]
+
+
+def test_top_k_matches_brute_force():
+    rnd = random.Random(5)
+    for _ in range(20):
+        items = [KnapsackItem(id=str(i), value=rnd.randint(1, 20), volume=rnd.randint(1, 3)) for i in range(8)]
+        subsets = [
+            subset
+            for size in range(1, len(items) + 1)
+            for subset in itertools.combinations(items, size)
+            if sum(i.volume for i in subset) <= 4
+        ]
+        expected = sorted((_value(list(s)) for s in subsets), reverse=True)[:3]
+
+        solutions = solve_top_k(items, capacity=4, k=3)
+
+        assert [_value(s) for s in solutions] == expected
+        assert len({frozenset(i.id for i in s) for s in solutions}) == len(solutions)
+
+
+def test_nothing_fits():
+    assert solve_top_k([KnapsackItem(id="a", value=1, volume=5)], capacity=4, k=3) == []
+    assert solve_top_k([], capacity=4, k=3) == []
@@ -0,0 +1,73 @@
+import math
+
+from model.passenger_drive_order import PassengerDriveOrder, PassengerDriveOrderStatus
+from service.open_orders_index import OpenOrdersIndex
+
+DRIVER_LOCATION = (32.078039, 34.806845)
+
+
+def _order(order_id: int, latitude: float, longitude: float) -> PassengerDriveOrder:
+    return PassengerDriveOrder(
+        id=order_id,
+        passengers_amount=1,
+        status=PassengerDriveOrderStatus.NEW,
+        source_location=[latitude, longitude],
+        dest_location=[32.080134, 34.791873],
+        trip_distance_km=2,
+        estimated_cost=10,
+    )
+
+
+def test_nearest_orders_sorted_by_distance():
+    index = OpenOrdersIndex(refresh_interval_seconds=30)
+    index.load([_order(1, 32.09, 34.81), _order(2, 32.0785, 34.807), _order(3, 32.2, 34.9)])
+
+    candidates = index.nearest(*DRIVER_LOCATION, amount=10, radius_km=5)
+
+    assert [c.id for c in candidates] == [2, 1]
+    assert candidates[0].distance_from_driver < candidates[1].distance_from_driver
+    assert candidates[0].distance > 0
+
+
+def test_nearest_orders_amount():
+    index = OpenOrdersIndex(refresh_interval_seconds=30)
+    index.load([_order(i, 32.078 + i / 1000, 34.806) for i in range(5)])
+
+    assert len(index.nearest(*DRIVER_LOCATION, amount=2, radius_km=5)) == 2
+
+
+def test_nearest_orders_predicate():
+    index = OpenOrdersIndex(refresh_interval_seconds=30)
+    index.load([_order(1, 32.09, 34.81), _order(2, 32.0785, 34.807)])
+
+    candidates = index.nearest(*DRIVER_LOCATION, amount=10, radius_km=5, predicate=lambda c: c.distance_from_driver > 1)
+
+    assert [c.id for c in candidates] == [1]
+
+
+def test_removed_orders_not_returned():
+    index = OpenOrdersIndex(refresh_interval_seconds=30)
+    index.load([_order(1, 32.0785, 34.807)])
+    index.add(_order(2, 32.079, 34.807))
+    index.remove(1)
+    index.remove(3)
+
+    assert [c.id for c in index.nearest(*DRIVER_LOCATION, amount=10, radius_km=5)] == [2]
+    assert len(index) == 1
+
+
+def test_index_freshness():
+    index = OpenOrdersIndex(refresh_interval_seconds=30)
+    assert not index.is_fresh
+    index.load([])
+    assert index.is_fresh
+    expired_index = OpenOrdersIndex(refresh_interval_seconds=0)
+    expired_index.load([])
+    assert not expired_index.is_fresh
+
+
+def test_nearest_orders_unbounded_radius():
+    index = OpenOrdersIndex(refresh_interval_seconds=30)
+    index.load([_order(1, 40.7, -74), _order(2, 32.0785, 34.807)])
+
+    assert [c.id for c in index.nearest(*DRIVER_LOCATION, amount=10, radius_km=math.inf)] == [2, 1]
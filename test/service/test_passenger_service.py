@@ -0,0 +1,118 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from model.passenger_drive_order import PassengerDriveOrder, PassengerDriveOrderStatus
+from model.requests.driver import Limit, LimitValues
+from service.candidate_search import CandidateSearch
+from service.open_orders_index import OpenOrdersIndex
+from service.passenger_service import PassengerService
+
+pytestmark = pytest.mark.asyncio
+
+DRIVER_LOCATION = [32.078039, 34.806845]
+
+
+def _order(order_id: int, latitude_offset: float) -> PassengerDriveOrder:
+    return PassengerDriveOrder(
+        id=order_id,
+        passengers_amount=1,
+        status=PassengerDriveOrderStatus.NEW,
+        source_location=[DRIVER_LOCATION[0] + latitude_offset, DRIVER_LOCATION[1]],
+        dest_location=[32.080134, 34.791873],
+        trip_distance_km=2,
+        estimated_cost=10,
+    )
+
+
+def _claiming_session(
+    index: OpenOrdersIndex, locked_order_ids: frozenset[int] = frozenset()
+) -> tuple[AsyncSession, list[list[int]]]:
+    """
+    Session which claims every order the index picked except the locked ones, and records the ids of every claim.
+    """
+    session = AsyncMock(AsyncSession)
+    claims = []
+    candidates = {c.id: c for c in index.nearest(*DRIVER_LOCATION, amount=100, radius_km=100)}
+
+    async def execute(statement, params):
+        claims.append(params["order_ids"])
+        result = MagicMock()
+        result.fetchall.return_value = [
+            candidates[order_id] for order_id in params["order_ids"] if order_id not in locked_order_ids
+        ]
+        return result
+
+    session.execute = execute
+    return session, claims
+
+
+def _index(orders: list[PassengerDriveOrder]) -> OpenOrdersIndex:
+    index = OpenOrdersIndex(refresh_interval_seconds=60)
+    index.load(orders)
+    return index
+
+
+async def test_search_stops_once_pool_is_full():
+    # ~0.5km, ~0.9km and ~2.2km away
+    index = _index([_order(1, 0.0045), _order(2, 0.008), _order(3, 0.02)])
+    session, claims = _claiming_session(index)
+    candidate_search = CandidateSearch(rings_km=(1, 3, 10), pool_size=2)
+    service = PassengerService(session, index, candidate_search)
+
+    candidates = await service.get_top_order_candidates(DRIVER_LOCATION, "driver")
+
+    assert [c.id for c in candidates] == [1, 2]
+    assert claims == [[1, 2]]
+    assert candidate_search.full_pools == 1
+
+
+async def test_search_expands_rings():
+    # ~0.5km, ~2.2km and ~22km away
+    index = _index([_order(1, 0.0045), _order(2, 0.02), _order(3, 0.2)])
+    session, claims = _claiming_session(index)
+    candidate_search = CandidateSearch(rings_km=(1, 3, 10), pool_size=4)
+    service = PassengerService(session, index, candidate_search)
+
+    candidates = await service.get_top_order_candidates(DRIVER_LOCATION, "driver")
+
+    assert [c.id for c in candidates] == [1, 2, 3]
+    assert claims == [[1], [2], [3]]
+    assert candidate_search.average_rings == 4
+
+
+async def test_search_bounded_by_pick_up_limit():
+    index = _index([_order(1, 0.0045), _order(2, 0.02)])
+    session, claims = _claiming_session(index)
+    service = PassengerService(session, index, CandidateSearch(rings_km=(1, 3, 10), pool_size=3))
+
+    candidates = await service.get_top_order_candidates(
+        DRIVER_LOCATION, "driver", limits={Limit.pick_up_distance: LimitValues(max=2)}
+    )
+
+    assert [c.id for c in candidates] == [1]
+
+
+async def test_search_stops_when_budget_is_exhausted():
+    index = _index([_order(1, 0.0045), _order(2, 0.02)])
+    session, claims = _claiming_session(index)
+    candidate_search = CandidateSearch(rings_km=(1, 3, 10), pool_size=3, budget_seconds=0)
+    service = PassengerService(session, index, candidate_search)
+
+    candidates = await service.get_top_order_candidates(DRIVER_LOCATION, "driver")
+
+    assert [c.id for c in candidates] == [1]
+    assert candidate_search.exhausted_budgets == 1
+
+
+async def test_unclaimed_candidates_stay_indexed():
+    index = _index([_order(1, 0.0045), _order(2, 0.008)])
+    session, claims = _claiming_session(index, locked_order_ids={2})
+    service = PassengerService(session, index, CandidateSearch(rings_km=(1, 3, 10), pool_size=2))
+
+    candidates = await service.get_top_order_candidates(DRIVER_LOCATION, "driver")
+
+    assert [c.id for c in candidates] == [1]
+    assert claims == [[1, 2]]
+    assert [c.id for c in index.nearest(*DRIVER_LOCATION, amount=10, radius_km=10)] == [2]
@@ -0,0 +1,63 @@
+from unittest.mock import MagicMock, AsyncMock
+
+import pytest
+
+from model.responses.directions_api import DirectionsApiResponse, DirectionsMatrixResponse
+from model.responses.geocode import Geocode
+from model.top_candidate import TopCandidate
+from service.cost_estimation_service import CostEstimationService
+from service.profit_estimation_service import ProfitEstimationService
+from service.time_service import TimeService
+
+pytestmark = pytest.mark.asyncio
+
+DRIVER_LOCATION = Geocode(latitude=0, longitude=0)
+
+
+def _candidate(order_id: int, source: float, dest: float) -> TopCandidate:
+    return TopCandidate(
+        distance_from_driver=0,
+        distance=0,
+        id=order_id,
+        passengers_amount=1,
+        source_location=[source, 0],
+        estimated_cost=50,
+        dest_location=[dest, 0],
+    )
+
+
+def _service() -> ProfitEstimationService:
+    # Locations on a line, 60 seconds and 1km per latitude degree
+    async def _get_matrix(sources: list[Geocode], destinations: list[Geocode]) -> DirectionsMatrixResponse:
+        distances = [[abs(s.latitude - d.latitude) for d in destinations] for s in sources]
+        return DirectionsMatrixResponse(
+            distances_meters=[[1000 * d for d in row] for row in distances],
+            durations_seconds=[[60 * d for d in row] for row in distances],
+        )
+
+    directions_service = MagicMock(get_matrix=AsyncMock(side_effect=_get_matrix))
+    return ProfitEstimationService(directions_service, CostEstimationService(), TimeService())
+
+
+def _cost(kms: float) -> float:
+    directions = DirectionsApiResponse(distance_meters=1000 * kms, duration_seconds=60 * kms)
+    return CostEstimationService().estimate_cost(TimeService().now(), directions)
+
+
+async def test_single_order_pays_the_way_to_pick_up():
+    profits = await _service().estimate_profits(DRIVER_LOCATION, [_candidate(1, 2, 10)])
+
+    assert profits == [pytest.approx(50 - _cost(2))]
+
+
+async def test_order_on_the_way_has_no_detour():
+    profits = await _service().estimate_profits(DRIVER_LOCATION, [_candidate(1, 1, 10), _candidate(2, 3, 8)])
+
+    assert profits[1] == pytest.approx(50 - _cost(0))
+    assert profits[0] > 50 - _cost(1) - 0.01
+
+
+async def test_order_in_the_opposite_direction_pays_its_detour():
+    profits = await _service().estimate_profits(DRIVER_LOCATION, [_candidate(1, 1, 10), _candidate(2, -2, -3)])
+
+    assert profits[1] < profits[0]
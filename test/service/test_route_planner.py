@@ -0,0 +1,68 @@
+import itertools
+import random
+
+import pytest
+
+from service.route_planner import plan_route, route_cost, cheapest_insertion_positions, insert_request
+
+
+def _line_durations(positions: list[float]) -> list[list[float]]:
+    return [[abs(a - b) for b in positions] for a in positions]
+
+
+def _best_route_cost(durations, requests) -> float:
+    stops = [stop for request in requests for stop in request]
+    feasible = (
+        route
+        for route in itertools.permutations(stops)
+        if all(route.index(pick_up) < route.index(drop_off) for pick_up, drop_off in requests)
+    )
+    return min(route_cost(durations, route) for route in feasible)
+
+
+def test_pick_ups_before_drop_offs():
+    # driver at 0, passengers going backwards
+    durations = _line_durations([0, 5, 1, 3, 2])
+    requests = [(1, 2), (3, 4)]
+
+    route = plan_route(durations, requests)
+
+    assert sorted(route) == [1, 2, 3, 4]
+    assert route.index(1) < route.index(2) and route.index(3) < route.index(4)
+
+
+def test_drop_off_on_the_way():
+    # the first passenger is dropped before the second is picked up
+    durations = _line_durations([0, 1, 2, 3, 4])
+    route = plan_route(durations, [(1, 2), (3, 4)])
+
+    assert route == [1, 2, 3, 4]
+
+
+def test_optimal_on_small_routes():
+    rnd = random.Random(7)
+    for _ in range(20):
+        points = [(rnd.random(), rnd.random()) for _ in range(7)]
+        durations = [[abs(a[0] - b[0]) + abs(a[1] - b[1]) for b in points] for a in points]
+        requests = [(1, 2), (3, 4), (5, 6)]
+
+        route = plan_route(durations, requests)
+
+        assert route_cost(durations, route) <= _best_route_cost(durations, requests) * 1.1
+
+
+def test_cheapest_insertion_positions():
+    rnd = random.Random(3)
+    points = [(rnd.random(), rnd.random()) for _ in range(7)]
+    durations = [[abs(a[0] - b[0]) + abs(a[1] - b[1]) for b in points] for a in points]
+    route = [1, 3, 2, 4]
+
+    added, positions = cheapest_insertion_positions(durations, route, (5, 6))
+
+    new_route = insert_request(route, (5, 6), positions)
+    assert new_route.index(5) < new_route.index(6)
+    assert added == pytest.approx(route_cost(durations, new_route) - route_cost(durations, route))
+    for i in range(len(route) + 1):
+        for j in range(i + 1, len(route) + 2):
+            other_route = insert_request(route, (5, 6), (i, j))
+            assert route_cost(durations, other_route) >= route_cost(durations, new_route) - 1e-9
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from service.single_flight import SingleFlight
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_concurrent_calls_coalesced():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def _call():
+        nonlocal calls
+        calls += 1
+        call_number = calls
+        await asyncio.sleep(0.01)
+        return call_number
+
+    results = await asyncio.gather(
+        *(single_flight.do("key", _call) for _ in range(5)), single_flight.do("other", _call)
+    )
+
+    assert results == [1, 1, 1, 1, 1, 2]
+    assert single_flight.coalesced == 4
+    assert len(single_flight) == 0
+    assert await single_flight.do("key", _call) == 3
+
+
+async def test_errors_shared():
+    single_flight = SingleFlight()
+
+    async def _call():
+        await asyncio.sleep(0.01)
+        raise ValueError()
+
+    results = await asyncio.gather(
+        single_flight.do("key", _call), single_flight.do("key", _call), return_exceptions=True
+    )
+
+    assert all(isinstance(r, ValueError) for r in results)
+    assert len(single_flight) == 0
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from model.responses.driver import SuggestionJobStatus
+from model.responses.knapsack import SuggestedSolution
+from service.suggestion_job_service import SuggestionJobService
+
+pytestmark = pytest.mark.asyncio
+
+
+def _suggestion() -> SuggestedSolution:
+    return SuggestedSolution(time=datetime.now(), expires_at=datetime.now(), solutions={})
+
+
+async def test_job_result():
+    service = SuggestionJobService(ttl_seconds=60)
+    release = asyncio.Event()
+    suggestion = _suggestion()
+
+    async def compute():
+        await release.wait()
+        return suggestion
+
+    job = service.submit("driver", "request", compute)
+    assert job.status == SuggestionJobStatus.PENDING
+    assert not await job.wait(0.01)
+
+    release.set()
+    assert await job.wait(1)
+    assert service.get("driver", job.id).status == SuggestionJobStatus.DONE
+    assert service.get("driver", job.id).result == suggestion
+
+
+async def test_pending_job_reused_for_driver():
+    service = SuggestionJobService(ttl_seconds=60)
+    release = asyncio.Event()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return _suggestion()
+
+    job = service.submit("driver", "request", compute)
+    assert service.submit("driver", "request", compute) is job
+    assert service.submit("other driver", "request", compute) is not job
+    with pytest.raises(HTTPException):
+        service.submit("driver", "other request", compute)
+
+    release.set()
+    await job.wait(1)
+    assert service.submit("driver", "request", compute) is not job
+    await asyncio.sleep(0)
+    assert calls == 3
+
+
+async def test_failed_job():
+    service = SuggestionJobService(ttl_seconds=60)
+
+    async def compute():
+        raise HTTPException(status_code=400, detail="No drives")
+
+    job = service.submit("driver", "request", compute)
+
+    assert await job.wait(1)
+    assert job.status == SuggestionJobStatus.FAILED
+    assert job.error == "No drives"
+
+
+async def test_job_of_other_driver_not_returned():
+    service = SuggestionJobService(ttl_seconds=60)
+
+    async def compute():
+        return _suggestion()
+
+    job = service.submit("driver", "request", compute)
+
+    assert service.get("other driver", job.id) is None
+    assert service.get("driver", "missing") is None
+    await service.close()
@@ -0,0 +1,37 @@
+import time
+
+from service.ttl_cache import TtlCache
+
+
+def test_get_set():
+    cache = TtlCache(max_size=10, ttl_seconds=30)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_ratio == 0.5
+
+
+def test_least_recently_used_evicted():
+    cache = TtlCache(max_size=2, ttl_seconds=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_expired_entries():
+    cache = TtlCache(max_size=10, ttl_seconds=30)
+    cache.set("a", 1, ttl_seconds=0.01)
+    cache.set("b", 2, ttl_seconds=0)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert len(cache) == 0
@@ -0,0 +1,51 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from httpx import AsyncClient, Request, Response
+
+from service.single_flight import SingleFlight
+from service.ttl_cache import TtlCache
+from service.user_handler_service import UserHandlerService
+
+pytestmark = pytest.mark.asyncio
+
+
+def _user_response(email: str) -> Response:
+    return Response(
+        200,
+        request=Request("GET", f"/users/{email}"),
+        json={
+            "code": 200,
+            "result": {"email": email, "full_name": email, "phone_number": "0500000000"},
+        },
+    )
+
+
+def _client() -> AsyncMock:
+    client = AsyncMock(AsyncClient)
+    client.get = AsyncMock(side_effect=lambda url, **kwargs: _user_response(url.rsplit("/", 1)[-1]))
+    client.put = AsyncMock(return_value=Response(200, request=Request("PUT", "/users"), json={"code": 200}))
+    return client
+
+
+async def test_get_users_by_email():
+    client = _client()
+    service = UserHandlerService(client, SingleFlight(), TtlCache(10, 30))
+
+    users = await service.get_users_by_email(["a@b.com", "c@d.com", "a@b.com"], "token")
+
+    assert {email: user.result.email for email, user in users.items()} == {"a@b.com": "a@b.com", "c@d.com": "c@d.com"}
+    assert client.get.await_count == 2
+
+
+async def test_user_profile_cached_until_updated():
+    client = _client()
+    service = UserHandlerService(client, profile_cache=TtlCache(10, 30))
+
+    await service.get_user_by_email("a@b.com", "token")
+    await service.get_user_by_email("a@b.com", "token")
+    assert client.get.await_count == 1
+
+    await service.update_user("a@b.com", "token", full_name="new", car_model=None, car_color=None, plate_number=None)
+    await service.get_user_by_email("a@b.com", "token")
+    assert client.get.await_count == 2